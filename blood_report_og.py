@@ -2,65 +2,70 @@ import streamlit as st
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
+from matplotlib.patches import Patch
 import os
 import re
 import json
+import logging
 import argparse
+import heapq
+import html
+import io
 import sys
+import importlib.util
+import tempfile
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from PIL import Image
-import nltk
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize, sent_tokenize
-import pytesseract
-
-
-# Download necessary NLTK data
-try:
-    nltk.data.find('tokenizers/punkt')
-    nltk.data.find('corpora/stopwords')
-    nltk.data.find('taggers/averaged_perceptron_tagger')
-except LookupError:
-    nltk.download('punkt')
-    nltk.download('stopwords')
-    nltk.download('averaged_perceptron_tagger')
+
+logger = logging.getLogger(__name__)
+
+
+# NLTK, the OCR libraries and transformers are heavy to import, so they are only
+# loaded when a report is actually processed
+@st.cache_resource
+def _ensure_nltk():
+    """Import NLTK and download its data if missing, at most once per worker"""
+    import nltk
+    try:
+        nltk.data.find('tokenizers/punkt')
+        nltk.data.find('corpora/stopwords')
+    except LookupError:
+        nltk.download('punkt')
+        nltk.download('stopwords')
+    return nltk
+
+@st.cache_resource
+def _english_stopwords():
+    """English stopwords, loaded from the NLTK corpus once instead of on every call"""
+    return frozenset(_ensure_nltk().corpus.stopwords.words('english'))
 
 # Optional imports with fallbacks
-try:
-    import pytesseract
-    TESSERACT_AVAILABLE = True
-except ImportError:
-    TESSERACT_AVAILABLE = False
+TESSERACT_AVAILABLE = importlib.util.find_spec("pytesseract") is not None
+if not TESSERACT_AVAILABLE:
     st.warning("pytesseract not available. OCR functionality will be limited.")
 
-try:
-    import pdf2image
-    PDF_IMAGE_AVAILABLE = True
-except ImportError:
-    PDF_IMAGE_AVAILABLE = False
+PDF_IMAGE_AVAILABLE = importlib.util.find_spec("pdf2image") is not None
+if not PDF_IMAGE_AVAILABLE:
     st.warning("pdf2image not available. PDF processing will be disabled.")
 
 # Replace spaCy with NLTK for basic NLP tasks
 def simple_nlp_processing(text):
     """Basic NLP processing using NLTK instead of spaCy"""
-    sentences = sent_tokenize(text)
-    words = word_tokenize(text)
-    stop_words = set(stopwords.words('english'))
-    filtered_words = [word for word in words if word.lower() not in stop_words]
-    # Basic POS tagging
-    pos_tags = nltk.pos_tag(filtered_words)
-    
-    # Extract medical terms and numbers
-    medical_terms = []
-    numbers = []
-    
-    for word, tag in pos_tags:
-        if tag.startswith('N') and len(word) > 3:  # Nouns that are longer than 3 chars
-            medical_terms.append(word)
-        if tag == 'CD':  # Cardinal numbers
-            try:
-                numbers.append(float(word))
-            except ValueError:
-                pass
+    nltk = _ensure_nltk()
+    stop_words = _english_stopwords()
+    sentences = nltk.sent_tokenize(text)
+    # Tokenize the sentences we already have (word_tokenize on the full text would
+    # run sentence splitting a second time) and drop stopwords in the same pass
+    filtered_words = [word for sentence in sentences
+                      for word in nltk.word_tokenize(sentence, preserve_line=True)
+                      if word.lower() not in stop_words]
+    # Extract medical terms and numbers. A POS tagger is not needed for this: long
+    # alphabetic tokens stand in for nouns and numeric tokens for cardinal numbers
+    medical_terms = [word for word in filtered_words if word.isalpha() and len(word) > 3]
+    numbers = [value for value in (_safe_float(word) for word in filtered_words if _NUM_RE.fullmatch(word))
+               if value is not None]
     
     return {
         'sentences': sentences,
@@ -68,15 +73,31 @@ def simple_nlp_processing(text):
         'numbers': numbers
     }
 
-# Try to import transformers, with proper error handling
-TRANSFORMERS_AVAILABLE = False
-try:
-    from transformers import pipeline
-    summarizer = pipeline("summarization")
-    TRANSFORMERS_AVAILABLE = True
-except (ImportError, RuntimeError, Exception) as e:
-    st.warning(f"Advanced summarization disabled: {str(e)}")
-    TRANSFORMERS_AVAILABLE = False
+# The summarization model is loaded on first use rather than at startup
+TRANSFORMERS_AVAILABLE = importlib.util.find_spec("transformers") is not None
+if not TRANSFORMERS_AVAILABLE:
+    st.warning("Advanced summarization disabled: transformers is not installed")
+
+@st.cache_resource
+def get_summarizer():
+    """Load the transformers summarization pipeline, at most once per worker"""
+    try:
+        from transformers import pipeline
+        summarizer = pipeline("summarization")
+    except (ImportError, RuntimeError, Exception) as e:
+        st.warning(f"Advanced summarization disabled: {str(e)}")
+        return None
+    
+    # On CPU, swap the model's linear layers for INT8 dynamically quantized ones:
+    # a quarter of the weight memory and noticeably faster generation
+    if summarizer.device.type == "cpu":
+        try:
+            import torch
+            summarizer.model = torch.quantization.quantize_dynamic(
+                summarizer.model, {torch.nn.Linear}, dtype=torch.qint8)
+        except (RuntimeError, Exception) as e:
+            st.warning(f"Using the full-precision summarization model: {str(e)}")
+    return summarizer
 
 # Define medical terms corpus for blood reports
 BLOOD_TEST_CORPUS = {
@@ -395,6 +416,73 @@ NORMAL_RANGES = {
     "Prolactin": (0, 50, "ng/L")
 }
 
+# Column-wise view of NORMAL_RANGES so results can be range-checked in one vector pass
+_TEST_IDX = {test: i for i, test in enumerate(NORMAL_RANGES)}
+_LOW = np.fromiter((low for low, _, _ in NORMAL_RANGES.values()), dtype=np.float64, count=len(NORMAL_RANGES))
+_HIGH = np.fromiter((high for _, high, _ in NORMAL_RANGES.values()), dtype=np.float64, count=len(NORMAL_RANGES))
+_UNITS = [unit for _, _, unit in NORMAL_RANGES.values()]
+_RANGE_LABELS = [f"{low} - {high}" for low, high, _ in NORMAL_RANGES.values()]
+_STATUS_LABELS = np.array(["Low", "Normal", "High"])  # indexed by range flag + 1
+
+NUMBA_AVAILABLE = importlib.util.find_spec("numba") is not None
+
+def _flag_ranges_numpy(values, low, high):
+    """Return -1/0/1 flags for values below, within or above their ranges"""
+    return np.where(values < low, -1, np.where(values > high, 1, 0)).astype(np.int8)
+
+@st.cache_resource
+def _range_flag_kernel():
+    """Return the range-check kernel, JIT-compiled with Numba when it's installed"""
+    if not NUMBA_AVAILABLE:
+        return _flag_ranges_numpy
+    
+    from numba import njit
+    
+    # Compiled in memory only: an on-disk cache is tied to the module name, so a
+    # stale or mismatched one (e.g. the script run as __main__) fails to load
+    @njit
+    def flag_ranges(values, low, high):
+        out = np.zeros(values.size, dtype=np.int8)
+        for i in range(values.size):
+            if values[i] < low[i]:
+                out[i] = -1
+            elif values[i] > high[i]:
+                out[i] = 1
+        return out
+    
+    return flag_ranges
+
+# Compiling the Numba kernel costs about a second, while NumPy checks a report's
+# few dozen values in microseconds, so only batches this large (where the loop
+# saves ~15 ms per million values) are sent to the JIT kernel
+NUMBA_MIN_BATCH_SIZE = 1_000_000
+
+# Kernel used for large batches in this process. st.cache_resource only memoizes
+# inside the Streamlit runtime, so the CLI would otherwise rebuild it per call
+_range_flags = None
+
+def _flag_ranges(values, low, high):
+    """Return -1/0/1 range flags, using the Numba kernel only for large batches"""
+    global _range_flags
+    if not NUMBA_AVAILABLE or values.size < NUMBA_MIN_BATCH_SIZE:
+        return _flag_ranges_numpy(values, low, high)
+    if _range_flags is not None:
+        return _range_flags(values, low, high)
+    
+    try:
+        from numba.core.errors import NumbaError
+        kernel = _range_flag_kernel()
+        flags = kernel(values, low, high)
+    except ImportError as error:
+        logger.warning("Numba failed to load, using NumPy range checks: %s", error)
+    except NumbaError as error:
+        logger.warning("Numba failed to compile the range kernel, using NumPy range checks: %s", error)
+    else:
+        _range_flags = kernel
+        return flags
+    _range_flags = _flag_ranges_numpy
+    return _range_flags(values, low, high)
+
 # Define descriptions for test categories
 CATEGORY_DESCRIPTIONS = {
     "Complete Blood Count (CBC)": "The CBC is a fundamental blood panel that examines blood cells (red, white, and platelets). It's used to evaluate overall health and detect disorders like anemia, infection, and various blood diseases.",
@@ -414,153 +502,166 @@ CATEGORY_DESCRIPTIONS = {
 }
 
 # Expanded indications for abnormal values
-def get_expanded_low_indication(test):
-    """Return detailed possible indications for low test values"""
-    indications = {
-        "RBC": {
-            "conditions": "anemia, blood loss, nutritional deficiencies (iron, vitamin B12, folate), bone marrow problems, chronic kidney disease, or certain medications",
-            "details": "Low red blood cells reduce oxygen delivery to tissues, causing fatigue, weakness, and shortness of breath. This may require further investigation with iron studies, vitamin levels, or bone marrow examination."
-        },
-        "WBC": {
-            "conditions": "infection, inflammation, stress, or certain types of cancer",
-            "details": "Low white blood cells can indicate an infection or a weakened immune system. Consult with a healthcare provider for further evaluation."
-        },
-        "Hb": {
-            "conditions": "anemia, blood loss, nutritional deficiencies, or chronic diseases",
-            "details": "Low hemoglobin levels can cause fatigue, weakness, and shortness of breath. This may require further investigation with iron studies or blood transfusion."
-        },
-        "HCT": {
-            "conditions": "anemia, blood loss, or overhydration",
-            "details": "Low hematocrit levels can indicate anemia, blood loss, or overhydration. Consult with a healthcare provider for further evaluation."
-        },
-        "PLT": {
-            "conditions": "bone marrow problems, autoimmune conditions, or increased platelet destruction",
-            "details": "Low platelets can increase the risk of bleeding and bruising. Consult with a healthcare provider for further evaluation."
-        },
-        "Glucose": {
-            "conditions": "hypoglycemia, which may be due to insulin excess, liver disease, or certain medications",
-            "details": "Low blood sugar levels can cause symptoms like dizziness, sweating, and hunger. Consult with a healthcare provider for further evaluation."
-        },
-        "Sodium": {
-            "conditions": "overhydration, kidney problems, heart failure, or certain medications",
-            "details": "Low sodium levels can cause symptoms like fatigue, weakness, and swelling. Consult with a healthcare provider for further evaluation."
-        },
-        "Potassium": {
-            "conditions": "kidney issues, diarrhea, vomiting, or certain medications",
-            "details": "Low potassium levels can cause symptoms like muscle weakness, irregular heartbeat, or constipation. Consult with a healthcare provider for further evaluation."
-        },
-        "Albumin": {
-            "conditions": "liver disease, malnutrition, or kidney problems",
-            "details": "Low albumin levels can cause swelling in the body, weakness, or fatigue. Consult with a healthcare provider for further evaluation."
-        },
-        "HDL": {
-            "conditions": "increased cardiovascular risk",
-            "details": "Low HDL cholesterol levels can increase the risk of heart disease. Consult with a healthcare provider for further evaluation."
-        },
-        "Iron": {
-            "conditions": "iron deficiency anemia or chronic blood loss",
-            "details": "Low iron levels can cause anemia, fatigue, and weakness. Consult with a healthcare provider for further evaluation."
-        }
+_EXPANDED_LOW_INDICATIONS = {
+    "RBC": {
+        "conditions": "anemia, blood loss, nutritional deficiencies (iron, vitamin B12, folate), bone marrow problems, chronic kidney disease, or certain medications",
+        "details": "Low red blood cells reduce oxygen delivery to tissues, causing fatigue, weakness, and shortness of breath. This may require further investigation with iron studies, vitamin levels, or bone marrow examination."
+    },
+    "WBC": {
+        "conditions": "infection, inflammation, stress, or certain types of cancer",
+        "details": "Low white blood cells can indicate an infection or a weakened immune system. Consult with a healthcare provider for further evaluation."
+    },
+    "Hb": {
+        "conditions": "anemia, blood loss, nutritional deficiencies, or chronic diseases",
+        "details": "Low hemoglobin levels can cause fatigue, weakness, and shortness of breath. This may require further investigation with iron studies or blood transfusion."
+    },
+    "HCT": {
+        "conditions": "anemia, blood loss, or overhydration",
+        "details": "Low hematocrit levels can indicate anemia, blood loss, or overhydration. Consult with a healthcare provider for further evaluation."
+    },
+    "PLT": {
+        "conditions": "bone marrow problems, autoimmune conditions, or increased platelet destruction",
+        "details": "Low platelets can increase the risk of bleeding and bruising. Consult with a healthcare provider for further evaluation."
+    },
+    "Glucose": {
+        "conditions": "hypoglycemia, which may be due to insulin excess, liver disease, or certain medications",
+        "details": "Low blood sugar levels can cause symptoms like dizziness, sweating, and hunger. Consult with a healthcare provider for further evaluation."
+    },
+    "Sodium": {
+        "conditions": "overhydration, kidney problems, heart failure, or certain medications",
+        "details": "Low sodium levels can cause symptoms like fatigue, weakness, and swelling. Consult with a healthcare provider for further evaluation."
+    },
+    "Potassium": {
+        "conditions": "kidney issues, diarrhea, vomiting, or certain medications",
+        "details": "Low potassium levels can cause symptoms like muscle weakness, irregular heartbeat, or constipation. Consult with a healthcare provider for further evaluation."
+    },
+    "Albumin": {
+        "conditions": "liver disease, malnutrition, or kidney problems",
+        "details": "Low albumin levels can cause swelling in the body, weakness, or fatigue. Consult with a healthcare provider for further evaluation."
+    },
+    "HDL": {
+        "conditions": "increased cardiovascular risk",
+        "details": "Low HDL cholesterol levels can increase the risk of heart disease. Consult with a healthcare provider for further evaluation."
+    },
+    "Iron": {
+        "conditions": "iron deficiency anemia or chronic blood loss",
+        "details": "Low iron levels can cause anemia, fatigue, and weakness. Consult with a healthcare provider for further evaluation."
     }
-    
-    default_info = {
-        "conditions": "various medical conditions requiring further clinical correlation",
-        "details": "Abnormal values should be interpreted in the context of your overall health, symptoms, and other test results. Consult with a healthcare provider for proper diagnosis."
+}
+
+_EXPANDED_HIGH_INDICATIONS = {
+    "RBC": {
+        "conditions": "polycythemia vera, dehydration, lung diseases, smoking, high altitude, or erythrocytosis",
+        "details": "Elevated red blood cells increase blood viscosity and can impair circulation, increasing risk of clots. Primary polycythemia (bone marrow disorder) should be distinguished from secondary causes like hypoxia."
+    },
+    "WBC": {
+        "conditions": "infection, inflammation, stress, or certain types of cancer",
+        "details": "High white blood cells can indicate an infection or a weakened immune system. Consult with a healthcare provider for further evaluation."
+    },
+    "Hb": {
+        "conditions": "polycythemia, dehydration, or lung disease",
+        "details": "High hemoglobin levels can cause symptoms like shortness of breath, fatigue, and chest pain. Consult with a healthcare provider for further evaluation."
+    },
+    "HCT": {
+        "conditions": "polycythemia, dehydration, or certain lung conditions",
+        "details": "High hematocrit levels can indicate polycythemia, dehydration, or certain lung conditions. Consult with a healthcare provider for further evaluation."
+    },
+    "PLT": {
+        "conditions": "infection, inflammation, or certain disorders",
+        "details": "High platelets can increase the risk of blood clots. Consult with a healthcare provider for further evaluation."
+    },
+    "Glucose": {
+        "conditions": "diabetes, stress, certain medications, or pancreatic issues",
+        "details": "High blood sugar levels can cause symptoms like frequent urination, thirst, and increased appetite. Consult with a healthcare provider for further evaluation."
+    },
+    "Creatinine": {
+        "conditions": "kidney problems, muscle breakdown, or dehydration",
+        "details": "High creatinine levels can indicate kidney problems, muscle breakdown, or dehydration. Consult with a healthcare provider for further evaluation."
+    },
+    "BUN": {
+        "conditions": "kidney problems, dehydration, high protein diet, or gastrointestinal bleeding",
+        "details": "High blood urea nitrogen levels can indicate kidney problems, dehydration, high protein diet, or gastrointestinal bleeding. Consult with a healthcare provider for further evaluation."
+    },
+    "Sodium": {
+        "conditions": "dehydration, diabetes insipidus, or excessive salt intake",
+        "details": "High sodium levels can cause symptoms like swelling, thirst, and confusion. Consult with a healthcare provider for further evaluation."
+    },
+    "Potassium": {
+        "conditions": "kidney disease, certain medications, or cell damage",
+        "details": "High potassium levels can cause symptoms like muscle weakness, irregular heartbeat, or heart problems. Consult with a healthcare provider for further evaluation."
+    },
+    "Total Bilirubin": {
+        "conditions": "liver problems, bile duct obstruction, or certain types of anemia",
+        "details": "High total bilirubin levels can indicate liver problems, bile duct obstruction, or certain types of anemia. Consult with a healthcare provider for further evaluation."
+    },
+    "ALT": {
+        "conditions": "liver damage, hepatitis, or certain medications",
+        "details": "High alanine transaminase levels can indicate liver damage, hepatitis, or certain medications. Consult with a healthcare provider for further evaluation."
+    },
+    "AST": {
+        "conditions": "liver damage, muscle injury, or heart problems",
+        "details": "High aspartate transaminase levels can indicate liver damage, muscle injury, or heart problems. Consult with a healthcare provider for further evaluation."
+    },
+    "Cholesterol": {
+        "conditions": "increased cardiovascular risk, genetic conditions, or poor diet",
+        "details": "High cholesterol levels can increase the risk of heart disease. Consult with a healthcare provider for further evaluation."
+    },
+    "Triglycerides": {
+        "conditions": "increased cardiovascular risk, diabetes, obesity, or alcohol consumption",
+        "details": "High triglyceride levels can increase the risk of heart disease. Consult with a healthcare provider for further evaluation."
+    },
+    "LDL": {
+        "conditions": "increased cardiovascular risk",
+        "details": "High LDL cholesterol levels can increase the risk of heart disease. Consult with a healthcare provider for further evaluation."
+    },
+    "TSH": {
+        "conditions": "hypothyroidism or thyroid medication issues",
+        "details": "High thyroid-stimulating hormone levels can indicate hypothyroidism or thyroid medication issues. Consult with a healthcare provider for further evaluation."
+    },
+    "CRP": {
+        "conditions": "inflammation, infection, or tissue damage",
+        "details": "High C-reactive protein levels can indicate inflammation, infection, or tissue damage. Consult with a healthcare provider for further evaluation."
     }
-    
-    return indications.get(test, default_info)
+}
+
+_DEFAULT_EXPANDED_INDICATION = {
+    "conditions": "various medical conditions requiring further clinical correlation",
+    "details": "Abnormal values should be interpreted in the context of your overall health, symptoms, and other test results. Consult with a healthcare provider for proper diagnosis."
+}
+
+def get_expanded_low_indication(test):
+    """Return detailed possible indications for low test values"""
+    return _EXPANDED_LOW_INDICATIONS.get(test, _DEFAULT_EXPANDED_INDICATION)
 
 def get_expanded_high_indication(test):
     """Return detailed possible indications for high test values"""
-    indications = {
-        "RBC": {
-            "conditions": "polycythemia vera, dehydration, lung diseases, smoking, high altitude, or erythrocytosis",
-            "details": "Elevated red blood cells increase blood viscosity and can impair circulation, increasing risk of clots. Primary polycythemia (bone marrow disorder) should be distinguished from secondary causes like hypoxia."
-        },
-        "WBC": {
-            "conditions": "infection, inflammation, stress, or certain types of cancer",
-            "details": "High white blood cells can indicate an infection or a weakened immune system. Consult with a healthcare provider for further evaluation."
-        },
-        "Hb": {
-            "conditions": "polycythemia, dehydration, or lung disease",
-            "details": "High hemoglobin levels can cause symptoms like shortness of breath, fatigue, and chest pain. Consult with a healthcare provider for further evaluation."
-        },
-        "HCT": {
-            "conditions": "polycythemia, dehydration, or certain lung conditions",
-            "details": "High hematocrit levels can indicate polycythemia, dehydration, or certain lung conditions. Consult with a healthcare provider for further evaluation."
-        },
-        "PLT": {
-            "conditions": "infection, inflammation, or certain disorders",
-            "details": "High platelets can increase the risk of blood clots. Consult with a healthcare provider for further evaluation."
-        },
-        "Glucose": {
-            "conditions": "diabetes, stress, certain medications, or pancreatic issues",
-            "details": "High blood sugar levels can cause symptoms like frequent urination, thirst, and increased appetite. Consult with a healthcare provider for further evaluation."
-        },
-        "Creatinine": {
-            "conditions": "kidney problems, muscle breakdown, or dehydration",
-            "details": "High creatinine levels can indicate kidney problems, muscle breakdown, or dehydration. Consult with a healthcare provider for further evaluation."
-        },
-        "BUN": {
-            "conditions": "kidney problems, dehydration, high protein diet, or gastrointestinal bleeding",
-            "details": "High blood urea nitrogen levels can indicate kidney problems, dehydration, high protein diet, or gastrointestinal bleeding. Consult with a healthcare provider for further evaluation."
-        },
-        "Sodium": {
-            "conditions": "dehydration, diabetes insipidus, or excessive salt intake",
-            "details": "High sodium levels can cause symptoms like swelling, thirst, and confusion. Consult with a healthcare provider for further evaluation."
-        },
-        "Potassium": {
-            "conditions": "kidney disease, certain medications, or cell damage",
-            "details": "High potassium levels can cause symptoms like muscle weakness, irregular heartbeat, or heart problems. Consult with a healthcare provider for further evaluation."
-        },
-        "Total Bilirubin": {
-            "conditions": "liver problems, bile duct obstruction, or certain types of anemia",
-            "details": "High total bilirubin levels can indicate liver problems, bile duct obstruction, or certain types of anemia. Consult with a healthcare provider for further evaluation."
-        },
-        "ALT": {
-            "conditions": "liver damage, hepatitis, or certain medications",
-            "details": "High alanine transaminase levels can indicate liver damage, hepatitis, or certain medications. Consult with a healthcare provider for further evaluation."
-        },
-        "AST": {
-            "conditions": "liver damage, muscle injury, or heart problems",
-            "details": "High aspartate transaminase levels can indicate liver damage, muscle injury, or heart problems. Consult with a healthcare provider for further evaluation."
-        },
-        "Cholesterol": {
-            "conditions": "increased cardiovascular risk, genetic conditions, or poor diet",
-            "details": "High cholesterol levels can increase the risk of heart disease. Consult with a healthcare provider for further evaluation."
-        },
-        "Triglycerides": {
-            "conditions": "increased cardiovascular risk, diabetes, obesity, or alcohol consumption",
-            "details": "High triglyceride levels can increase the risk of heart disease. Consult with a healthcare provider for further evaluation."
-        },
-        "LDL": {
-            "conditions": "increased cardiovascular risk",
-            "details": "High LDL cholesterol levels can increase the risk of heart disease. Consult with a healthcare provider for further evaluation."
-        },
-        "TSH": {
-            "conditions": "hypothyroidism or thyroid medication issues",
-            "details": "High thyroid-stimulating hormone levels can indicate hypothyroidism or thyroid medication issues. Consult with a healthcare provider for further evaluation."
-        },
-        "CRP": {
-            "conditions": "inflammation, infection, or tissue damage",
-            "details": "High C-reactive protein levels can indicate inflammation, infection, or tissue damage. Consult with a healthcare provider for further evaluation."
-        }
-    }
-    
-    default_info = {
-        "conditions": "various medical conditions requiring further clinical correlation",
-        "details": "Abnormal values should be interpreted in the context of your overall health, symptoms, and other test results. Consult with a healthcare provider for proper diagnosis."
-    }
-    
-    return indications.get(test, default_info)
+    return _EXPANDED_HIGH_INDICATIONS.get(test, _DEFAULT_EXPANDED_INDICATION)
+
+# Upper bound on the pages rendered and OCR'd together from one PDF
+PDF_PAGE_BATCH_SIZE = 20
 
-def extract_text_from_image(image):
+def extract_text_from_image(image_file):
     """Extract text from an uploaded image using OCR"""
-    if TESSERACT_AVAILABLE:
-        return pytesseract.image_to_string(image)
-    else:
+    if not TESSERACT_AVAILABLE:
         st.error("OCR functionality requires pytesseract. Please install it.")
         return ""
+    
+    # Accept both uploaded files and plain paths (the CLI passes a path)
+    if isinstance(image_file, (str, os.PathLike)):
+        with open(image_file, "rb") as f:
+            image_bytes = f.read()
+    else:
+        image_bytes = image_file.getvalue()
+    return _ocr_image_bytes(image_bytes)
+
+# Streamlit reruns the whole script on every interaction, so OCR is cached on the
+# encoded file. The image is decoded from those bytes so its palette and metadata
+# (such as the DPI Tesseract uses) reach the OCR unchanged
+@st.cache_data(show_spinner=False)
+def _ocr_image_bytes(image_bytes):
+    """OCR an encoded image file, cached on its content"""
+    import pytesseract
+    return pytesseract.image_to_string(Image.open(io.BytesIO(image_bytes)))
 
 def extract_text_from_pdf(pdf_file):
     """Convert PDF to images and extract text using OCR"""
@@ -572,379 +673,493 @@ def extract_text_from_pdf(pdf_file):
         st.error("OCR functionality requires pytesseract. Please install it.")
         return ""
     
-    images = pdf2image.convert_from_bytes(pdf_file.read())
-    text = ""
-    for image in images:
-        text += pytesseract.image_to_string(image)
-    return text
-
-def find_hemoglobin(text):
-    """Special function to specifically find hemoglobin values in text"""
-    # Common formats for hemoglobin
-    hb_patterns = [
-        r'[Hh]emoglobin\s*:?\s*(\d+\.?\d*)\s*g/?d?[lL]?',
-        r'[Hh]b\s*:?\s*(\d+\.?\d*)\s*g/?d?[lL]?',
-        r'[Hh][Gg][Bb]\s*:?\s*(\d+\.?\d*)',
-        r'[Hh]emoglobin[^0-9]*(\d+\.?\d*)\s*g',
-        r'[Hh]b[^0-9]*(\d+\.?\d*)\s*g',
-        r'hemoglobin[\s:=]+(\d+\.?\d*)',
-        r'(\d+\.?\d*)\s*g/?d?[lL]\s*hemoglobin',
-        r'(\d+\.?\d*)\s*g/?d?[lL]\s*hb',
-    ]
-    
-    for pattern in hb_patterns:
-        match = re.search(pattern, text, re.IGNORECASE)
-        if match:
-            try:
-                value = float(match.group(1))
-                # Only accept reasonable hemoglobin values
-                if 5 <= value <= 25:
-                    return value
-            except ValueError:
-                pass
-                
-    # Look for high values in g/L (range typically 120-175)
-    g_l_patterns = [
-        r'[Hh]emoglobin\s*:?\s*(\d{3}\.?\d*)\s*g/?[lL]',
-        r'[Hh]b\s*:?\s*(\d{3}\.?\d*)\s*g/?[lL]'
-    ]
+    # Accept both uploaded files and plain paths (the CLI passes a path)
+    if isinstance(pdf_file, (str, os.PathLike)):
+        with open(pdf_file, "rb") as f:
+            pdf_bytes = f.read()
+    else:
+        pdf_bytes = pdf_file.getvalue()
+    return _ocr_pdf_bytes(pdf_bytes)
+
+@st.cache_data(show_spinner=False)
+def _ocr_pdf_bytes(pdf_bytes):
+    """OCR every page of a PDF, cached on the file's content"""
+    import pdf2image
+    page_count = pdf2image.pdfinfo_from_bytes(pdf_bytes)["Pages"]
+    if not page_count:
+        return ""
     
-    for pattern in g_l_patterns:
-        match = re.search(pattern, text)
-        if match:
-            try:
-                value = float(match.group(1))
-                if 100 <= value <= 200:  # Typical g/L range
-                    return value / 10  # Convert to g/dL
-            except ValueError:
-                pass
+    # Pages are rendered to disk and OCR'd in batches, one Tesseract run per batch
+    # through its file-list input, instead of starting Tesseract (and reloading its
+    # language data) once per page. Each batch runs in its own Tesseract process,
+    # so threads are enough to keep every core busy. Parallel Tesseract processes
+    # are each limited to one OpenMP thread, so they don't oversubscribe the cores
+    workers = min(os.cpu_count() or 1, page_count)
+    batch_size = min(PDF_PAGE_BATCH_SIZE, -(-page_count // workers))
+    chunks = []
+    with tempfile.TemporaryDirectory() as tmpdir, _omp_thread_limit(1 if workers > 1 else None), \
+            ThreadPoolExecutor(max_workers=workers) as executor:
+        # Render the next batch while earlier ones are being OCR'd, keeping at most
+        # one batch per worker in flight so large scans never sit on disk all at once
+        pending = deque()
+        for page_paths in _iter_pdf_page_batches(pdf_bytes, page_count, batch_size, tmpdir):
+            pending.append(executor.submit(_ocr_image_files, page_paths, tmpdir))
+            if len(pending) >= workers:
+                chunks.append(pending.popleft().result())
+        chunks.extend(future.result() for future in pending)
+    return "\n".join(chunks)
+
+@contextmanager
+def _omp_thread_limit(limit):
+    """Set OMP_THREAD_LIMIT for subprocesses started inside the block, unless the user set it"""
+    # pytesseract has no env argument, so Tesseract inherits os.environ; the old
+    # value is restored so libraries loaded later (e.g. torch) keep their threads
+    if limit is None or "OMP_THREAD_LIMIT" in os.environ:
+        yield
+        return
+    os.environ["OMP_THREAD_LIMIT"] = str(limit)
+    try:
+        yield
+    finally:
+        os.environ.pop("OMP_THREAD_LIMIT", None)
+
+def _iter_pdf_page_batches(pdf_bytes, page_count, batch_size, workdir):
+    """Render a PDF to PNG files batch by batch, yielding the paths of each batch"""
+    import pdf2image
+    for first_page in range(1, page_count + 1, batch_size):
+        last_page = min(first_page + batch_size - 1, page_count)
+        yield pdf2image.convert_from_bytes(pdf_bytes, output_folder=workdir, fmt="png", paths_only=True,
+                                           first_page=first_page, last_page=last_page)
+
+def _ocr_image_files(image_paths, workdir):
+    """OCR several image files with a single Tesseract run using its file-list input"""
+    import pytesseract
+    with tempfile.NamedTemporaryFile("w", suffix=".txt", dir=workdir, delete=False) as list_file:
+        list_file.write("\n".join(image_paths) + "\n")
+    try:
+        return pytesseract.image_to_string(list_file.name)
+    finally:
+        # Drop the rendered pages as soon as they are read
+        for path in image_paths:
+            os.remove(path)
+
+# Pre-compiled patterns shared by the value extractors
+_NUM_RE = re.compile(r'(\d+\.?\d*)')
+_LEADING_NUM_RE = re.compile(r'^\s*(\d+\.?\d*)')
+_DIGIT_RE = re.compile(r'\d')  # lines without any digit can't hold a value
+
+def _safe_float(value):
+    """Convert a string to float, returning None if it doesn't parse"""
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+def _iter_floats(line):
+    """Lazily yield the numbers in a line, so callers can stop at the first usable one"""
+    return (value for value in (_safe_float(m.group(1)) for m in _NUM_RE.finditer(line))
+            if value is not None)
+
+def _trie_regex(words):
+    """Build a prefix-factored regex alternation that matches any of the given words"""
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}  # end-of-word marker
+    
+    def node_to_regex(node):
+        branches = [re.escape(char) + node_to_regex(child)
+                    for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        if len(branches) == 1 and '' not in node:
+            return branches[0]
+        # Optional group when a word can also end here; greedy, so longer words win
+        return '(?:' + '|'.join(branches) + ')' + ('?' if '' in node else '')
+    
+    return node_to_regex(trie)
+
+# Lowercased corpus names for the case-insensitive fallbacks, computed once
+_CORPUS_LOWER = [(test, test.lower(), full_name.lower()) for test, full_name in BLOOD_TEST_CORPUS.items()]
+
+def _has_word_boundary(line, index):
+    """Same test as a regex word boundary: a word character on exactly one side of index"""
+    before = index > 0 and (line[index - 1].isalnum() or line[index - 1] == '_')
+    after = index < len(line) and (line[index].isalnum() or line[index] == '_')
+    return before != after
+
+def _find_word(line, word):
+    """Position of the first whole-word occurrence of a literal in line, or -1"""
+    pos = line.find(word)
+    while pos >= 0:
+        if _has_word_boundary(line, pos) and _has_word_boundary(line, pos + len(word)):
+            return pos
+        pos = line.find(word, pos + 1)
+    return -1
+
+# Every corpus test code, its lower-case form and its full name in one trie-shaped
+# alternation, so the corpus fallback is a single sweep over the text rather than
+# three searches per test per line. Streamlit re-executes this script on every
+# rerun, so the trie is built once per process and cached
+@st.cache_resource
+def _get_corpus_matcher():
+    """Return the corpus name-to-test index and the compiled name/value pattern"""
+    # Reversed so the first test listed wins a name shared by several tests
+    name_to_test = {name: test
+                    for test, full_name in reversed(list(BLOOD_TEST_CORPUS.items()))
+                    for name in (test, test.lower(), full_name)}
+    value_re = re.compile('(' + _trie_regex(name_to_test) + r')[^\S\n]*:?[^\S\n]*(\d+\.?\d*)')
+    return name_to_test, value_re
+
+# Any hemoglobin keyword followed by its value (optionally after a short
+# non-numeric gap such as ": " or " (Hb) "), or a g/dL value followed by the
+# keyword - one sweep over the text instead of one search per format.
+# These patterns are lower-case and run case-sensitively against text that the
+# caller has lowercased once, instead of case-folding inside every match
+_HB_UNION = re.compile(
+    r'\b(?:ha?emoglobin|hb|hgb)\b[^0-9\n]{0,20}(\d+\.?\d*)'
+    r'|(\d+\.?\d*)\s*g/?d?l\s*(?:ha?emoglobin|hb)\b')
+_HB_LINE_RE = re.compile(r'hemoglobin|hb\b|hgb')
+
+# Same idea for WBC: keyword then value, or value and count unit then keyword
+_WBC_UNION = re.compile(
+    r'(?:\bwbc|white\s*blood\s*cells?|leukocytes?|\btlc|total\s*leukocyte\s*count)[^0-9\n]{0,20}(\d+\.?\d*)'
+    r'|(\d+\.?\d*)\s*(?:k?/[μµ]l|10\^3/[μµ]l)\s*(?:wbc|white\s*(?:blood\s*)?cells|leukocytes)')
+_WBC_LINE_RE = re.compile(r'wbc|white\s*blood\s*cell|leukocyte|tlc')
+_WBC_TABLE_RE = re.compile(r'wbc|white\s*blood\s*cell|leukocyte')
+
+def find_hemoglobin(text_lower, lines_lower=None):
+    """Special function to specifically find hemoglobin values in lowercased text"""
+    for match in _HB_UNION.finditer(text_lower):
+        try:
+            value = float(match.group(1) or match.group(2))
+        except ValueError:
+            continue
+        # Only accept reasonable hemoglobin values
+        if 5 <= value <= 25:  # g/dL range
+            return value
+        elif 100 <= value <= 200:  # g/L range
+            return value / 10  # Convert to g/dL
                 
     # Scan through any line with "hemoglobin" and look for numbers
-    for line in text.split('\n'):
-        if re.search(r'[Hh]emoglobin|[Hh]b\b|[Hh][Gg][Bb]', line, re.IGNORECASE):
-            numbers = re.findall(r'(\d+\.?\d*)', line)
-            for num in numbers:
-                try:
-                    value = float(num)
-                    if 5 <= value <= 25:  # g/dL range
-                        return value
-                    elif 100 <= value <= 200:  # g/L range
-                        return value / 10
-                except ValueError:
-                    pass
+    if lines_lower is None:
+        lines_lower = text_lower.splitlines()
+    for line in lines_lower:
+        if _DIGIT_RE.search(line) and _HB_LINE_RE.search(line):
+            # First number in the g/dL (5-25) or g/L (100-200) range
+            value = next((v for v in _iter_floats(line) if 5 <= v <= 25 or 100 <= v <= 200), None)
+            if value is not None:
+                return value if value <= 25 else value / 10
                 
     return None
 
-def find_wbc(text):
-    """Special function to specifically find white blood cell values in text"""
-    # Common formats for WBC
-    wbc_patterns = [
-        r'[Ww]hite\s*[Bb]lood\s*[Cc]ell\s*[Cc]ount\s*:?\s*(\d+\.?\d*)',
-        r'[Ww]hite\s*[Bb]lood\s*[Cc]ells?\s*:?\s*(\d+\.?\d*)',
-        r'[Ww][Bb][Cc]\s*:?\s*(\d+\.?\d*)',
-        r'[Ww][Bb][Cc][^0-9]*(\d+\.?\d*)',
-        r'[Ll]eukocytes?\s*:?\s*(\d+\.?\d*)',
-        r'[Tt]otal\s*[Ll]eukocyte\s*[Cc]ount\s*:?\s*(\d+\.?\d*)',
-        r'[Tt][Ll][Cc]\s*:?\s*(\d+\.?\d*)',
-        r'(\d+\.?\d*)\s*[Kk]?\/[μµ][Ll]\s*[Ww][Bb][Cc]',
-        r'(\d+\.?\d*)\s*[Kk]?\/[μµ][Ll]\s*[Ww]hite\s*[Bb]lood\s*[Cc]ells',
-        r'(\d+\.?\d*)\s*[Kk]?\/[μµ][Ll]\s*[Ll]eukocytes',
-        r'(\d+\.?\d*)\s*10\^3\/[μµ][Ll]\s*[Ww][Bb][Cc]',
-        r'(\d+\.?\d*)\s*10\^3\/[μµ][Ll]\s*[Ww]hite\s*[Cc]ells',
-        r'[Ww][Bb][Cc][\s:=]+(\d+\.?\d*)',
-        r'[Ll]eukocytes?[\s:=]+(\d+\.?\d*)',
-    ]
-    
-    for pattern in wbc_patterns:
-        match = re.search(pattern, text, re.IGNORECASE)
-        if match:
-            try:
-                value = float(match.group(1))
-                # Only accept reasonable WBC values (in thousands/μL)
-                if 0.5 <= value <= 50:
-                    return value
-                # Handle SI units (10^9/L)
-                elif 0.5 <= value <= 50:
-                    return value  # Same range for both units
-            except ValueError:
-                pass
+def find_wbc(text_lower, lines_lower=None):
+    """Special function to specifically find white blood cell values in lowercased text"""
+    for match in _WBC_UNION.finditer(text_lower):
+        try:
+            value = float(match.group(1) or match.group(2))
+        except ValueError:
+            continue
+        # Only accept reasonable WBC values (in thousands/μL or 10^9/L)
+        if 0.5 <= value <= 50:
+            return value
     
     # Scan through any line with "WBC" and look for numbers
-    for line in text.split('\n'):
-        if re.search(r'[Ww][Bb][Cc]|[Ww]hite\s*[Bb]lood\s*[Cc]ell|[Ll]eukocyte|[Tt][Ll][Cc]', line, re.IGNORECASE):
-            # Look for numbers that could be WBC count
-            numbers = re.findall(r'(\d+\.?\d*)', line)
-            for num in numbers:
-                try:
-                    value = float(num)
-                    if 0.5 <= value <= 50:  # Typical range for WBC in K/μL or 10^9/L
-                        return value
-                except ValueError:
-                    pass
+    if lines_lower is None:
+        lines_lower = text_lower.splitlines()
+    for line in lines_lower:
+        if _DIGIT_RE.search(line) and _WBC_LINE_RE.search(line):
+            # Look for numbers that could be WBC count (typical range in K/μL or 10^9/L)
+            value = next((v for v in _iter_floats(line) if 0.5 <= v <= 50), None)
+            if value is not None:
+                return value
             
     # Look for tabular format with "WBC" in one cell and value in the next
-    lines = text.split('\n')
-    for i, line in enumerate(lines):
-        if re.search(r'[Ww][Bb][Cc]|[Ww]hite\s*[Bb]lood\s*[Cc]ell|[Ll]eukocyte', line, re.IGNORECASE) and i < len(lines) - 1:
+    for i, line in enumerate(lines_lower):
+        if _WBC_TABLE_RE.search(line) and i < len(lines_lower) - 1:
             # Check next line for possible values
-            next_line = lines[i+1]
-            numbers = re.findall(r'(\d+\.?\d*)', next_line)
-            for num in numbers:
-                try:
-                    value = float(num)
-                    if 0.5 <= value <= 50:  # Typical range for WBC
-                        return value
-                except ValueError:
-                    pass
+            next_line = lines_lower[i+1]
+            value = next((v for v in _iter_floats(next_line) if 0.5 <= v <= 50), None)  # Typical range for WBC
+            if value is not None:
+                return value
                 
     return None
 
+# Create alternative names and abbreviations for common tests
+ALTERNATIVE_NAMES = {
+    # Complete Blood Count (CBC)
+    "Hb": ["Hb", "HGB", "Hemoglobin", "Haemoglobin", "HG", "Hgb", "hemoglobin", "haemoglobin", "Hgb"],
+    "RBC": ["RBC", "Red Blood Cell", "Red Blood Cells", "Red blood count", "Erythrocytes", "red cells", "red cell count", "erythrocyte count"],
+    "WBC": ["WBC", "White Blood Cell", "White Blood Cells", "White blood count", "Leukocytes", "white cells", "white cell count", "leukocyte count", "TLC", "total leukocyte count", "WBC count", "Leukocyte count"],
+    "HCT": ["HCT", "Hct", "Hematocrit", "PCV", "Packed Cell Volume", "hematocrit", "haematocrit"],
+    "MCV": ["MCV", "Mean Corpuscular Volume", "Mean Cell Volume"],
+    "MCH": ["MCH", "Mean Corpuscular Hemoglobin", "Mean Cell Hemoglobin"],
+    "MCHC": ["MCHC", "Mean Corpuscular Hemoglobin Concentration", "Mean Cell Hemoglobin Concentration"],
+    "RDW": ["RDW", "Red Cell Distribution Width", "RDW-CV", "RDW-SD"],
+    "PLT": ["PLT", "Platelet", "Platelets", "Thrombocytes", "platelet count", "Plt count", "Thrombocyte count"],
+    "MPV": ["MPV", "Mean Platelet Volume"],
+    
+    # White Blood Cell Differential
+    "Neutrophils": ["Neutrophils", "Neutrophil", "Neut", "Neutro", "Polymorphs", "Polys", "PMN", "Segs", "Segmented neutrophils"],
+    "Lymphocytes": ["Lymphocytes", "Lymphocyte", "Lymphs", "Lympho"],
+    "Monocytes": ["Monocytes", "Monocyte", "Mono"],
+    "Eosinophils": ["Eosinophils", "Eosinophil", "Eos"],
+    "Basophils": ["Basophils", "Basophil", "Baso"],
+    "NeutrophilsAbs": ["Absolute Neutrophil Count", "ANC", "Neutrophils Absolute", "Abs Neutrophils", "Neutrophil count", "Neutrophils #"],
+    "LymphocytesAbs": ["Absolute Lymphocyte Count", "ALC", "Lymphocytes Absolute", "Abs Lymphocytes", "Lymphocyte count", "Lymphocytes #"],
+    
+    # Kidney Function Tests
+    "BUN": ["BUN", "Blood Urea Nitrogen", "Urea Nitrogen", "Urea", "Blood Urea"],
+    "Creatinine": ["Creatinine", "CREA", "Cr", "creatinine", "Serum Creatinine"],
+    "eGFR": ["eGFR", "Estimated GFR", "Glomerular Filtration Rate", "Est. GFR"],
+    
+    # Electrolytes
+    "Sodium": ["Sodium", "Na", "Na+", "Serum Sodium"],
+    "Potassium": ["Potassium", "K", "K+", "Serum Potassium"],
+    "Chloride": ["Chloride", "Cl", "Cl-", "Serum Chloride"],
+    "Bicarbonate": ["Bicarbonate", "HCO3", "HCO3-", "CO2", "Carbon Dioxide"],
+    "Calcium": ["Calcium", "Ca", "Ca++", "Serum Calcium", "Total Calcium"],
+    "Phosphorus": ["Phosphorus", "Phosphate", "PO4", "P"],
+    "Magnesium": ["Magnesium", "Mg", "Mg++"],
+    
+    # Liver Function Tests
+    "Total Protein": ["Total Protein", "TP", "Protein, Total", "Serum Protein"],
+    "Albumin": ["Albumin", "Alb", "Serum Albumin"],
+    "Globulin": ["Globulin", "Glob", "Serum Globulin"],
+    "Total Bilirubin": ["Total Bilirubin", "TBIL", "Bilirubin, Total", "Bilirubin Total"],
+    "Direct Bilirubin": ["Direct Bilirubin", "DBIL", "Conjugated Bilirubin", "Bilirubin Direct"],
+    "Alkaline Phosphatase": ["Alkaline Phosphatase", "ALP", "AlkPhos", "Alk Phos"],
+    "ALT": ["ALT", "Alanine Aminotransferase", "SGPT", "Alanine transaminase"],
+    "AST": ["AST", "Aspartate Aminotransferase", "SGOT", "Aspartate transaminase"],
+    "GGT": ["GGT", "Gamma-Glutamyl Transferase", "Gamma GT", "GGTP"],
+    
+    # Lipid Panel
+    "Cholesterol": ["Cholesterol", "CHOL", "Total Cholesterol", "TC", "T. Chol", "cholesterol"],
+    "Triglycerides": ["Triglycerides", "TG", "TRIG", "Trigs"],
+    "HDL": ["HDL", "HDL Cholesterol", "HDL-C", "High-Density Lipoprotein"],
+    "LDL": ["LDL", "LDL Cholesterol", "LDL-C", "Low-Density Lipoprotein"],
+    "VLDL": ["VLDL", "VLDL Cholesterol", "Very Low-Density Lipoprotein"],
+    
+    # Blood Glucose Tests
+    "Glucose": ["Glucose", "GLU", "Blood Glucose", "Serum Glucose", "blood sugar", "BS"],
+    "FBS": ["FBS", "Fasting Blood Sugar", "Fasting Glucose", "Fasting Blood Glucose"],
+    "HbA1c": ["HbA1c", "A1c", "Glycated Hemoglobin", "Glycosylated Hemoglobin", "Glycohemoglobin", "Hemoglobin A1c"],
+    
+    # Thyroid Function Tests
+    "TSH": ["TSH", "Thyroid Stimulating Hormone", "Thyrotropin"],
+    "T3": ["T3", "Triiodothyronine", "Total T3"],
+    "T4": ["T4", "Thyroxine", "Total T4"],
+    "Free T3": ["Free T3", "FT3", "Free Triiodothyronine"],
+    "Free T4": ["Free T4", "FT4", "Free Thyroxine"],
+    
+    # Iron Studies
+    "Iron": ["Iron", "Serum Iron", "Fe"],
+    "TIBC": ["TIBC", "Total Iron Binding Capacity"],
+    "Ferritin": ["Ferritin", "Serum Ferritin"],
+    "Transferrin Saturation": ["Transferrin Saturation", "TSAT", "Iron Saturation", "% Saturation", "Transferrin Sat"],
+    
+    # Vitamins
+    "Vitamin B12": ["Vitamin B12", "B12", "Cobalamin"],
+    "Folate": ["Folate", "Folic Acid", "Serum Folate"],
+    "Vitamin D": ["Vitamin D", "25-OH Vitamin D", "25-Hydroxyvitamin D", "25(OH)D", "Calcidiol"],
+    
+    # Inflammatory Markers
+    "CRP": ["CRP", "C-Reactive Protein"],
+    "hsCRP": ["hsCRP", "High-Sensitivity CRP", "hs-CRP", "High sensitive CRP"],
+    "ESR": ["ESR", "Erythrocyte Sedimentation Rate", "Sed Rate", "Sedimentation Rate"],
+    
+    # Coagulation Studies
+    "PT": ["PT", "Prothrombin Time"],
+    "INR": ["INR", "International Normalized Ratio"],
+    "aPTT": ["aPTT", "PTT", "Activated Partial Thromboplastin Time", "Partial Thromboplastin Time"],
+    
+    # Cardiac Markers
+    "Troponin I": ["Troponin I", "cTnI", "Cardiac Troponin I"],
+    "Troponin T": ["Troponin T", "cTnT", "Cardiac Troponin T"],
+    
+    # Other Common Tests
+    "Uric Acid": ["Uric Acid", "UA"],
+    "Amylase": ["Amylase", "Serum Amylase"],
+    "Lipase": ["Lipase", "Serum Lipase"]
+}
+
+# Patterns 1-4 of the alias scan ("Name: 12.3", "Name = 12.3", "Name 12.3" and
+# "12.3 Name"). All aliases of all tests are found with one trie-shaped
+# alternation of plain names over the lowercased text; the value is then read
+# with a short anchored match right after (or just before) each name hit, so the
+# regex engine only attempts the value patterns where a name actually occurs.
+# Names must not sit inside a longer word (so "T3" doesn't match inside "FT3"),
+# and name and value must share a line
+_NOT_LETTER_BEFORE = r'(?<![^\W\d_])'
+_NOT_LETTER_AFTER = r'(?![^\W\d_])'
+_VALUE_AFTER_NAME_RE = re.compile(r'[^\S\n]*[:=]?[^\S\n]*(\d+\.?\d*)')
+_VALUE_BEFORE_NAME_RE = re.compile(r'(?<![\d.])(\d+\.?\d*)[^\S\n]+\Z')  # used with endpos at the name
+_VALUE_BEFORE_NAME_WINDOW = 40
+
+@st.cache_resource
+def _get_alias_matcher():
+    """Return the lowercased alias-to-test index and the compiled alias name pattern"""
+    # Reversed so the first test listed wins an alias shared by several tests
+    alias_to_test = {alias.lower(): test
+                     for test, aliases in reversed(list(ALTERNATIVE_NAMES.items()))
+                     for alias in aliases}
+    name_re = re.compile(f'{_NOT_LETTER_BEFORE}(?:{_trie_regex(alias_to_test)}){_NOT_LETTER_AFTER}')
+    return alias_to_test, name_re
+
+# Exact (case-sensitive) aliases for pattern 5, a test name alone on its line
+_ALIAS_LINE_TO_TEST = {alias: test
+                       for test, aliases in reversed(list(ALTERNATIVE_NAMES.items()))
+                       for alias in aliases}
+
+# The analysis steps below are pure functions of their inputs, so their results are
+# cached and the reruns Streamlit does on every interaction (such as opening an
+# expander) replay them instead of re-parsing the report. Warnings they emit are
+# replayed along with the cached result
+@st.cache_data(show_spinner=False)
 def extract_blood_values(text):
     """Extract blood test values from the text"""
     results = {}
+    # Split and lowercase once and share the lines with every line-based pass
+    lines = text.splitlines()
+    text_lower = text.lower()
+    lines_lower = text_lower.splitlines()
     
     # First try dedicated extraction for critical values
-    hb_value = find_hemoglobin(text)
+    hb_value = find_hemoglobin(text_lower, lines_lower)
     if hb_value:
         results["Hb"] = hb_value
     
     # Special extraction for WBC
-    wbc_value = find_wbc(text)
+    wbc_value = find_wbc(text_lower, lines_lower)
     if wbc_value:
         results["WBC"] = wbc_value
     
-    # Use the simple NLP processing to help with medical term identification
-    nlp_results = simple_nlp_processing(text)
-    
-    # Create alternative names and abbreviations for common tests
-    alternative_names = {
-        # Complete Blood Count (CBC)
-        "Hb": ["Hb", "HGB", "Hemoglobin", "Haemoglobin", "HG", "Hgb", "hemoglobin", "haemoglobin", "Hgb"],
-        "RBC": ["RBC", "Red Blood Cell", "Red Blood Cells", "Red blood count", "Erythrocytes", "red cells", "red cell count", "erythrocyte count"],
-        "WBC": ["WBC", "White Blood Cell", "White Blood Cells", "White blood count", "Leukocytes", "white cells", "white cell count", "leukocyte count", "TLC", "total leukocyte count", "WBC count", "Leukocyte count"],
-        "HCT": ["HCT", "Hct", "Hematocrit", "PCV", "Packed Cell Volume", "hematocrit", "haematocrit"],
-        "MCV": ["MCV", "Mean Corpuscular Volume", "Mean Cell Volume"],
-        "MCH": ["MCH", "Mean Corpuscular Hemoglobin", "Mean Cell Hemoglobin"],
-        "MCHC": ["MCHC", "Mean Corpuscular Hemoglobin Concentration", "Mean Cell Hemoglobin Concentration"],
-        "RDW": ["RDW", "Red Cell Distribution Width", "RDW-CV", "RDW-SD"],
-        "PLT": ["PLT", "Platelet", "Platelets", "Thrombocytes", "platelet count", "Plt count", "Thrombocyte count"],
-        "MPV": ["MPV", "Mean Platelet Volume"],
-        
-        # White Blood Cell Differential
-        "Neutrophils": ["Neutrophils", "Neutrophil", "Neut", "Neutro", "Polymorphs", "Polys", "PMN", "Segs", "Segmented neutrophils"],
-        "Lymphocytes": ["Lymphocytes", "Lymphocyte", "Lymphs", "Lympho"],
-        "Monocytes": ["Monocytes", "Monocyte", "Mono"],
-        "Eosinophils": ["Eosinophils", "Eosinophil", "Eos"],
-        "Basophils": ["Basophils", "Basophil", "Baso"],
-        "NeutrophilsAbs": ["Absolute Neutrophil Count", "ANC", "Neutrophils Absolute", "Abs Neutrophils", "Neutrophil count", "Neutrophils #"],
-        "LymphocytesAbs": ["Absolute Lymphocyte Count", "ALC", "Lymphocytes Absolute", "Abs Lymphocytes", "Lymphocyte count", "Lymphocytes #"],
-        
-        # Kidney Function Tests
-        "BUN": ["BUN", "Blood Urea Nitrogen", "Urea Nitrogen", "Urea", "Blood Urea"],
-        "Creatinine": ["Creatinine", "CREA", "Cr", "creatinine", "Serum Creatinine"],
-        "eGFR": ["eGFR", "Estimated GFR", "Glomerular Filtration Rate", "Est. GFR"],
-        
-        # Electrolytes
-        "Sodium": ["Sodium", "Na", "Na+", "Serum Sodium"],
-        "Potassium": ["Potassium", "K", "K+", "Serum Potassium"],
-        "Chloride": ["Chloride", "Cl", "Cl-", "Serum Chloride"],
-        "Bicarbonate": ["Bicarbonate", "HCO3", "HCO3-", "CO2", "Carbon Dioxide"],
-        "Calcium": ["Calcium", "Ca", "Ca++", "Serum Calcium", "Total Calcium"],
-        "Phosphorus": ["Phosphorus", "Phosphate", "PO4", "P"],
-        "Magnesium": ["Magnesium", "Mg", "Mg++"],
-        
-        # Liver Function Tests
-        "Total Protein": ["Total Protein", "TP", "Protein, Total", "Serum Protein"],
-        "Albumin": ["Albumin", "Alb", "Serum Albumin"],
-        "Globulin": ["Globulin", "Glob", "Serum Globulin"],
-        "Total Bilirubin": ["Total Bilirubin", "TBIL", "Bilirubin, Total", "Bilirubin Total"],
-        "Direct Bilirubin": ["Direct Bilirubin", "DBIL", "Conjugated Bilirubin", "Bilirubin Direct"],
-        "Alkaline Phosphatase": ["Alkaline Phosphatase", "ALP", "AlkPhos", "Alk Phos"],
-        "ALT": ["ALT", "Alanine Aminotransferase", "SGPT", "Alanine transaminase"],
-        "AST": ["AST", "Aspartate Aminotransferase", "SGOT", "Aspartate transaminase"],
-        "GGT": ["GGT", "Gamma-Glutamyl Transferase", "Gamma GT", "GGTP"],
-        
-        # Lipid Panel
-        "Cholesterol": ["Cholesterol", "CHOL", "Total Cholesterol", "TC", "T. Chol", "cholesterol"],
-        "Triglycerides": ["Triglycerides", "TG", "TRIG", "Trigs"],
-        "HDL": ["HDL", "HDL Cholesterol", "HDL-C", "High-Density Lipoprotein"],
-        "LDL": ["LDL", "LDL Cholesterol", "LDL-C", "Low-Density Lipoprotein"],
-        "VLDL": ["VLDL", "VLDL Cholesterol", "Very Low-Density Lipoprotein"],
-        
-        # Blood Glucose Tests
-        "Glucose": ["Glucose", "GLU", "Blood Glucose", "Serum Glucose", "blood sugar", "BS"],
-        "FBS": ["FBS", "Fasting Blood Sugar", "Fasting Glucose", "Fasting Blood Glucose"],
-        "HbA1c": ["HbA1c", "A1c", "Glycated Hemoglobin", "Glycosylated Hemoglobin", "Glycohemoglobin", "Hemoglobin A1c"],
-        
-        # Thyroid Function Tests
-        "TSH": ["TSH", "Thyroid Stimulating Hormone", "Thyrotropin"],
-        "T3": ["T3", "Triiodothyronine", "Total T3"],
-        "T4": ["T4", "Thyroxine", "Total T4"],
-        "Free T3": ["Free T3", "FT3", "Free Triiodothyronine"],
-        "Free T4": ["Free T4", "FT4", "Free Thyroxine"],
-        
-        # Iron Studies
-        "Iron": ["Iron", "Serum Iron", "Fe"],
-        "TIBC": ["TIBC", "Total Iron Binding Capacity"],
-        "Ferritin": ["Ferritin", "Serum Ferritin"],
-        "Transferrin Saturation": ["Transferrin Saturation", "TSAT", "Iron Saturation", "% Saturation", "Transferrin Sat"],
-        
-        # Vitamins
-        "Vitamin B12": ["Vitamin B12", "B12", "Cobalamin"],
-        "Folate": ["Folate", "Folic Acid", "Serum Folate"],
-        "Vitamin D": ["Vitamin D", "25-OH Vitamin D", "25-Hydroxyvitamin D", "25(OH)D", "Calcidiol"],
-        
-        # Inflammatory Markers
-        "CRP": ["CRP", "C-Reactive Protein"],
-        "hsCRP": ["hsCRP", "High-Sensitivity CRP", "hs-CRP", "High sensitive CRP"],
-        "ESR": ["ESR", "Erythrocyte Sedimentation Rate", "Sed Rate", "Sedimentation Rate"],
-        
-        # Coagulation Studies
-        "PT": ["PT", "Prothrombin Time"],
-        "INR": ["INR", "International Normalized Ratio"],
-        "aPTT": ["aPTT", "PTT", "Activated Partial Thromboplastin Time", "Partial Thromboplastin Time"],
-        
-        # Cardiac Markers
-        "Troponin I": ["Troponin I", "cTnI", "Cardiac Troponin I"],
-        "Troponin T": ["Troponin T", "cTnT", "Cardiac Troponin T"],
-        
-        # Other Common Tests
-        "Uric Acid": ["Uric Acid", "UA"],
-        "Amylase": ["Amylase", "Serum Amylase"],
-        "Lipase": ["Lipase", "Serum Lipase"]
-    }
-    
-    # Process each line
-    for line in text.split('\n'):
-        # Skip empty lines
-        if not line.strip():
-            continue
+    # Try common patterns for blood test values in one pass; the first value found
+    # for a test wins, so the dedicated finders' results are kept
+    alias_to_test, alias_name_re = _get_alias_matcher()
+    remaining = ALTERNATIVE_NAMES.keys() - results.keys()  # stop scanning once every alias test has a value
+    consumed = 0  # end of the last value taken, so a number is never read twice
+    for name_match in alias_name_re.finditer(text_lower):
+        value_match = _VALUE_AFTER_NAME_RE.match(text_lower, name_match.end())
+        if value_match:
+            consumed = value_match.end()
+        else:
+            window_start = max(consumed, name_match.start() - _VALUE_BEFORE_NAME_WINDOW)
+            value_match = _VALUE_BEFORE_NAME_RE.search(text_lower, window_start, name_match.start())
+            if not value_match:
+                continue
+            consumed = name_match.end()
         
-        # Try common patterns for blood test values
-        for test, aliases in alternative_names.items():
-            # Skip hemoglobin if we already found it
-            if test == "Hb" and "Hb" in results:
+        test = alias_to_test[name_match.group()]
+        if test not in results:
+            try:
+                results[test] = float(value_match.group(1))
+            except ValueError:
                 continue
-                
-            for alias in aliases:
-                # Try various patterns:
-                # Pattern 1: "Test Name: 12.3 unit"
-                pattern1 = fr'{alias}\s*:?\s*(\d+\.?\d*)'
-                # Pattern 2: "Test Name = 12.3 unit"
-                pattern2 = fr'{alias}\s*=\s*(\d+\.?\d*)'
-                # Pattern 3: "Test Name 12.3 unit"
-                pattern3 = fr'{alias}\s+(\d+\.?\d*)'
-                # Pattern 4: "12.3 unit Test Name"
-                pattern4 = fr'(\d+\.?\d*)\s+{alias}'
-                # Pattern 5: Test separated by newline from value
-                if line.strip() == alias:
-                    next_line_index = text.split('\n').index(line) + 1
-                    if next_line_index < len(text.split('\n')):
-                        next_line = text.split('\n')[next_line_index]
-                        number_match = re.search(r'^\s*(\d+\.?\d*)', next_line)
-                        if number_match:
-                            try:
-                                results[test] = float(number_match.group(1))
-                                break
-                            except ValueError:
-                                pass
-                
-                match = (re.search(pattern1, line, re.IGNORECASE) or 
-                         re.search(pattern2, line, re.IGNORECASE) or 
-                         re.search(pattern3, line, re.IGNORECASE) or 
-                         re.search(pattern4, line, re.IGNORECASE))
-                
-                if match:
-                    try:
-                        results[test] = float(match.group(1))
-                        break
-                    except ValueError:
-                        pass
-            
-            # If we found this test, move to the next
-            if test in results:
+            remaining.discard(test)
+            if not remaining:
                 break
     
+    # Pattern 5: Test separated by newline from value
+    for line, next_line in zip(lines, lines[1:]):
+        if not remaining:
+            break
+        test = _ALIAS_LINE_TO_TEST.get(line.strip())
+        if test is None or test in results:
+            continue
+        number_match = _LEADING_NUM_RE.search(next_line)
+        if number_match:
+            try:
+                results[test] = float(number_match.group(1))
+                remaining.discard(test)
+            except ValueError:
+                pass
+    
     # Look for the standard test names if we haven't found them with the aliases
-    for test in BLOOD_TEST_CORPUS.keys():
-        if test not in results:  # Only look for tests we haven't found yet
-            pattern1 = fr'{test}\s*:?\s*(\d+\.?\d*)'
-            pattern2 = fr'{test.lower()}\s*:?\s*(\d+\.?\d*)'
-            pattern3 = fr'{BLOOD_TEST_CORPUS[test]}\s*:?\s*(\d+\.?\d*)'
-            
-            # Search in each line
-            for line in text.split('\n'):
-                match = re.search(pattern1, line) or re.search(pattern2, line) or re.search(pattern3, line)
-                if match:
-                    try:
-                        results[test] = float(match.group(1))
-                        break
-                    except ValueError:
-                        pass
+    corpus_name_to_test, corpus_value_re = _get_corpus_matcher()
+    remaining = BLOOD_TEST_CORPUS.keys() - results.keys()
+    for match in corpus_value_re.finditer(text):
+        if not remaining:
+            break
+        test = corpus_name_to_test[match.group(1)]
+        if test not in results:  # Only fill in tests we haven't found yet
+            try:
+                results[test] = float(match.group(2))
+                remaining.discard(test)
+            except ValueError:
+                pass
     
     # If we still haven't found much, try the NLTK approach
     if len(results) < 10:  # Look for more values if we haven't found many
+        # Use the simple NLP processing to help with medical term identification; it
+        # is only run when the pattern passes came up short
+        nlp_results = simple_nlp_processing(text)
         for term in nlp_results['medical_terms']:
             # Check if the term is related to any blood test
-            for test, full_name in BLOOD_TEST_CORPUS.items():
+            term_lower = term.lower()
+            for test, test_lower, full_name_lower in _CORPUS_LOWER:
                 if test in results:
                     continue
                     
-                if term.lower() in full_name.lower() or term.lower() == test.lower():
+                if term_lower in full_name_lower or term_lower == test_lower:
                     # Look for numbers near this term
-                    term_index = text.lower().find(term.lower())
+                    term_index = text_lower.find(term_lower)
                     if term_index >= 0:
                         # Look for numbers in a 100-character window around the term
                         window_start = max(0, term_index - 50)
-                        window_end = min(len(text), term_index + 100)
-                        window = text[window_start:window_end]
-                        numbers = re.findall(r'\d+\.?\d*', window)
-                        if numbers:
-                            # Use the closest number to the term
-                            closest_number = None
-                            min_distance = float('inf')
-                            term_pos_in_window = term_index - window_start
-                            
-                            for num_str in numbers:
-                                num_pos = window.find(num_str)
-                                distance = abs(num_pos - term_pos_in_window)
-                                if distance < min_distance:
-                                    min_distance = distance
-                                    closest_number = num_str
-                            
-                            if closest_number and min_distance < 50:  # Only use if within 50 chars
-                                try:
-                                    results[test] = float(closest_number)
-                                except ValueError:
-                                    pass
+                        window_end = min(len(text_lower), term_index + 100)
+                        window = text_lower[window_start:window_end]
+                        # Use the closest number to the term, measured from where each
+                        # match actually sits (so repeated numbers get their own position)
+                        term_pos_in_window = term_index - window_start
+                        closest = min(((m.group(1), abs(m.start() - term_pos_in_window))
+                                       for m in _NUM_RE.finditer(window)),
+                                      key=lambda pair: pair[1], default=None)
+                        
+                        if closest and closest[1] < 50:  # Only use if within 50 chars
+                            try:
+                                results[test] = float(closest[0])
+                            except ValueError:
+                                pass
     
     # Look for values in tabular format
     # This often appears in blood reports where test names are in one column and values in another
-    lines = text.split('\n')
-    for i in range(len(lines)):
-        line = lines[i]
+    for line in lines_lower:
+        # Headers, notes and name-only lines have no value to take
+        if not _DIGIT_RE.search(line):
+            continue
         
-        # Look for test names that might be in a table
-        for test, full_name in BLOOD_TEST_CORPUS.items():
+        # Look for test names that might be in a table; the names are literals, so a
+        # plain substring search with boundary checks does the job of a \b regex
+        for test, test_lower, full_name_lower in _CORPUS_LOWER:
             if test in results:
                 continue
                 
-            if re.search(fr'\b{test}\b', line, re.IGNORECASE) or re.search(fr'\b{full_name}\b', line, re.IGNORECASE):
-                # Look for numbers on the same line, with preference to the right side
-                numbers = re.findall(r'(\d+\.?\d*)', line)
-                right_side = line[line.lower().find(test.lower()) + len(test):]
-                right_numbers = re.findall(r'(\d+\.?\d*)', right_side)
-                
-                if right_numbers:
-                    try:
-                        results[test] = float(right_numbers[0])
-                    except ValueError:
-                        pass
-                elif numbers:
-                    try:
-                        results[test] = float(numbers[-1])  # Take last number if multiple found
-                    except ValueError:
-                        pass
+            name_end = _find_word(line, test_lower)
+            if name_end >= 0:
+                name_end += len(test_lower)
+            else:
+                name_end = _find_word(line, full_name_lower)
+                if name_end < 0:
+                    continue
+                name_end += len(full_name_lower)
+            
+            # Look for numbers on the same line, with preference to the right side of the name
+            numbers = list(_NUM_RE.finditer(line))
+            right_number = next((m for m in numbers if m.start() >= name_end), None)
+            
+            if right_number:
+                try:
+                    results[test] = float(right_number.group(1))
+                except ValueError:
+                    pass
+            elif numbers:
+                try:
+                    results[test] = float(numbers[-1].group(1))  # Take last number if multiple found
+                except ValueError:
+                    pass
     
     # If hemoglobin is still missing, notify the user
     if "Hb" not in results:
@@ -956,117 +1171,137 @@ def extract_blood_values(text):
     
     return results
 
+@st.cache_data(show_spinner=False)
 def analyze_blood_results(results):
     """Analyze blood test results and generate insights"""
     insights = []
     abnormal_values = []
     
-    for test, value in results.items():
-        if test in NORMAL_RANGES:
-            low, high, unit = NORMAL_RANGES[test]
-            if value < low:
-                abnormal_values.append(f"{test} ({BLOOD_TEST_CORPUS.get(test, test)}) is low: {value} {unit}")
-                insights.append(f"Low {test} may indicate {get_low_indication(test)}")
-            elif value > high:
-                abnormal_values.append(f"{test} ({BLOOD_TEST_CORPUS.get(test, test)}) is high: {value} {unit}")
-                insights.append(f"High {test} may indicate {get_high_indication(test)}")
+    # Only tests with a known range can be flagged
+    tests = [test for test in results if test in _TEST_IDX]
+    if not tests:
+        return abnormal_values, insights
+    
+    idx = np.fromiter((_TEST_IDX[test] for test in tests), dtype=np.int32, count=len(tests))
+    values = np.fromiter((results[test] for test in tests), dtype=np.float64, count=len(tests))
+    flags = _flag_ranges(values, _LOW[idx], _HIGH[idx])
+    
+    for i in np.flatnonzero(flags):
+        test = tests[i]
+        value = results[test]
+        unit = _UNITS[idx[i]]
+        if flags[i] < 0:
+            abnormal_values.append(f"{test} ({BLOOD_TEST_CORPUS.get(test, test)}) is low: {value} {unit}")
+            insights.append(f"Low {test} may indicate {get_low_indication(test)}")
+        else:
+            abnormal_values.append(f"{test} ({BLOOD_TEST_CORPUS.get(test, test)}) is high: {value} {unit}")
+            insights.append(f"High {test} may indicate {get_high_indication(test)}")
     
     return abnormal_values, insights
 
+_LOW_INDICATIONS = {
+    "RBC": "anemia, blood loss, nutritional deficiency, or bone marrow issues.",
+    "WBC": "bone marrow problems, autoimmune disorders, or certain infections.",
+    "Hb": "anemia, blood loss, nutritional deficiencies, or chronic diseases.",
+    "HCT": "anemia, blood loss, or overhydration.",
+    "PLT": "bone marrow problems, autoimmune conditions, or increased platelet destruction.",
+    "Glucose": "hypoglycemia, which may be due to insulin excess, liver disease, or certain medications.",
+    "Sodium": "overhydration, kidney problems, heart failure, or certain medications.",
+    "Potassium": "kidney issues, diarrhea, vomiting, or certain medications.",
+    "Albumin": "liver disease, malnutrition, or kidney problems.",
+    "HDL": "increased cardiovascular risk.",
+    "Iron": "iron deficiency anemia or chronic blood loss."
+}
+
 def get_low_indication(test):
     """Return possible indications for low test values"""
-    indications = {
-        "RBC": "anemia, blood loss, nutritional deficiency, or bone marrow issues.",
-        "WBC": "bone marrow problems, autoimmune disorders, or certain infections.",
-        "Hb": "anemia, blood loss, nutritional deficiencies, or chronic diseases.",
-        "HCT": "anemia, blood loss, or overhydration.",
-        "PLT": "bone marrow problems, autoimmune conditions, or increased platelet destruction.",
-        "Glucose": "hypoglycemia, which may be due to insulin excess, liver disease, or certain medications.",
-        "Sodium": "overhydration, kidney problems, heart failure, or certain medications.",
-        "Potassium": "kidney issues, diarrhea, vomiting, or certain medications.",
-        "Albumin": "liver disease, malnutrition, or kidney problems.",
-        "HDL": "increased cardiovascular risk.",
-        "Iron": "iron deficiency anemia or chronic blood loss."
-    }
-    
-    return indications.get(test, "various medical conditions")
+    return _LOW_INDICATIONS.get(test, "various medical conditions")
+
+_HIGH_INDICATIONS = {
+    "RBC": "polycythemia, dehydration, or lung diseases.",
+    "WBC": "infection, inflammation, stress, or certain types of cancer.",
+    "Hb": "polycythemia, dehydration, or lung disease.",
+    "HCT": "polycythemia, dehydration, or certain lung conditions.",
+    "PLT": "infection, inflammation, or certain disorders.",
+    "Glucose": "diabetes, stress, certain medications, or pancreatic issues.",
+    "Creatinine": "kidney problems, muscle breakdown, or dehydration.",
+    "BUN": "kidney problems, dehydration, high protein diet, or gastrointestinal bleeding.",
+    "Sodium": "dehydration, diabetes insipidus, or excessive salt intake.",
+    "Potassium": "kidney disease, certain medications, or cell damage.",
+    "Total Bilirubin": "liver problems, bile duct obstruction, or certain types of anemia.",
+    "ALT": "liver damage, hepatitis, or certain medications.",
+    "AST": "liver damage, muscle injury, or heart problems.",
+    "Cholesterol": "increased cardiovascular risk, genetic conditions, or poor diet.",
+    "Triglycerides": "increased cardiovascular risk, diabetes, obesity, or alcohol consumption.",
+    "LDL": "increased cardiovascular risk.",
+    "TSH": "hypothyroidism or thyroid medication issues.",
+    "CRP": "inflammation, infection, or tissue damage."
+}
 
 def get_high_indication(test):
     """Return possible indications for high test values"""
-    indications = {
-        "RBC": "polycythemia, dehydration, or lung diseases.",
-        "WBC": "infection, inflammation, stress, or certain types of cancer.",
-        "Hb": "polycythemia, dehydration, or lung disease.",
-        "HCT": "polycythemia, dehydration, or certain lung conditions.",
-        "PLT": "infection, inflammation, or certain disorders.",
-        "Glucose": "diabetes, stress, certain medications, or pancreatic issues.",
-        "Creatinine": "kidney problems, muscle breakdown, or dehydration.",
-        "BUN": "kidney problems, dehydration, high protein diet, or gastrointestinal bleeding.",
-        "Sodium": "dehydration, diabetes insipidus, or excessive salt intake.",
-        "Potassium": "kidney disease, certain medications, or cell damage.",
-        "Total Bilirubin": "liver problems, bile duct obstruction, or certain types of anemia.",
-        "ALT": "liver damage, hepatitis, or certain medications.",
-        "AST": "liver damage, muscle injury, or heart problems.",
-        "Cholesterol": "increased cardiovascular risk, genetic conditions, or poor diet.",
-        "Triglycerides": "increased cardiovascular risk, diabetes, obesity, or alcohol consumption.",
-        "LDL": "increased cardiovascular risk.",
-        "TSH": "hypothyroidism or thyroid medication issues.",
-        "CRP": "inflammation, infection, or tissue damage."
-    }
-    
-    return indications.get(test, "various medical conditions")
+    return _HIGH_INDICATIONS.get(test, "various medical conditions")
+
+@st.cache_data(show_spinner=False)
+def _score_sentences(text):
+    """Split text into sentences and score each by its normalized word frequencies"""
+    nltk = _ensure_nltk()
+    stop_words = _english_stopwords()
+    # Tokenize the text into sentences
+    sentences = nltk.sent_tokenize(text)
+    # Word frequencies are counted over the whole lower-cased text, which punkt
+    # splits differently from the original-case sentences, so it gets its own pass
+    words = nltk.word_tokenize(text.lower())
+    sentence_words = [nltk.word_tokenize(sentence.lower()) for sentence in sentences]
+    
+    # Give every distinct token of the text an id so counting and scoring become
+    # array operations; sentence tokens the text never produced get no score
+    vocabulary = {}
+    word_ids = np.fromiter((vocabulary.setdefault(word, len(vocabulary)) for word in words),
+                           dtype=np.intp, count=len(words))
+    counted = np.fromiter((word.isalnum() and word not in stop_words for word in vocabulary),
+                          dtype=bool, count=len(vocabulary))
+    sentence_tokens = [(i, vocabulary[word]) for i, words_in_sentence in enumerate(sentence_words)
+                       for word in words_in_sentence if word in vocabulary]
+    sentence_ids = np.fromiter((i for i, _ in sentence_tokens), dtype=np.intp, count=len(sentence_tokens))
+    token_ids = np.fromiter((token for _, token in sentence_tokens), dtype=np.intp, count=len(sentence_tokens))
+    
+    # Count word frequency, then normalize by the most frequent word
+    word_frequencies = np.bincount(word_ids, minlength=len(vocabulary)) * counted
+    max_frequency = word_frequencies.max() if word_frequencies.any() else 1
+    word_frequencies = word_frequencies / max_frequency
+    
+    # Score each sentence by the summed frequencies of its words; sentences without
+    # any counted word get no score, so they are never ranked
+    scores = np.bincount(sentence_ids, weights=word_frequencies[token_ids], minlength=len(sentences))
+    has_counted_word = np.bincount(sentence_ids, weights=counted[token_ids], minlength=len(sentences)) > 0
+    sentence_scores = {int(i): float(scores[i]) for i in np.flatnonzero(has_counted_word)}
+    
+    return sentences, sentence_scores
 
 def simple_text_summarization(text, num_sentences=5):
     """Provide a basic text summarization using NLTK without transformers or spaCy"""
-    # Tokenize the text into sentences
-    sentences = sent_tokenize(text)
+    # Scoring is cached per text, so repeated summaries of one report reuse it
+    sentences, sentence_scores = _score_sentences(text)
     
     # If there aren't many sentences, return them all
     if len(sentences) <= num_sentences:
         return " ".join(sentences)
     
-    # Calculate word frequency
-    words = word_tokenize(text.lower())
-    stop_words = set(stopwords.words('english'))
-    filtered_words = [word for word in words if word.lower() not in stop_words 
-                      and word.isalnum()]
-    
-    # Count word frequency
-    word_frequencies = {}
-    for word in filtered_words:
-        if word not in word_frequencies:
-            word_frequencies[word] = 1
-        else:
-            word_frequencies[word] += 1
-    
-    # Normalize frequencies
-    max_frequency = max(word_frequencies.values()) if word_frequencies else 1
-    for word in word_frequencies:
-        word_frequencies[word] = word_frequencies[word] / max_frequency
-    
-    # Calculate sentence scores based on word frequencies
-    sentence_scores = {}
-    for i, sentence in enumerate(sentences):
-        words_in_sentence = word_tokenize(sentence.lower())
-        for word in words_in_sentence:
-            if word in word_frequencies:
-                if i not in sentence_scores:
-                    sentence_scores[i] = word_frequencies[word]
-                else:
-                    sentence_scores[i] += word_frequencies[word]
-    
-    # Get top N sentences
-    ranked_sentences = sorted([(score, i) for i, score in sentence_scores.items()], reverse=True)
-    top_sentence_indices = [i for _, i in ranked_sentences[:num_sentences]]
+    # Get top N sentences without sorting all of them
+    top_sentences = heapq.nlargest(num_sentences, ((score, i) for i, score in sentence_scores.items()))
+    top_sentence_indices = [i for _, i in top_sentences]
     top_sentence_indices.sort()  # Keep original order
     
     summary = " ".join([sentences[i] for i in top_sentence_indices])
     return summary
 
+@st.cache_data(show_spinner=False)
 def summarize_report(text, extracted_values, abnormal_values, insights):
     """Generate a comprehensive summary of the blood report"""
     # Create a basic summary using NLP if the text is long enough
-    if len(text) > 1000 and TRANSFORMERS_AVAILABLE:
+    summarizer = get_summarizer() if len(text) > 1000 and TRANSFORMERS_AVAILABLE else None
+    if summarizer is not None:
         try:
             # Limit text to 1000 tokens for transformer model
             summary = summarizer(text[:4000], max_length=150, min_length=50, do_sample=False)[0]['summary_text']
@@ -1077,22 +1312,22 @@ def summarize_report(text, extracted_values, abnormal_values, insights):
     else:
         summary = simple_text_summarization(text, 3)  # Use first 3 most important sentences for short texts
     
-    # Create a structured report summary
-    full_summary = f"""
+    # Create a structured report summary; sections are collected and joined once
+    parts = [f"""
     ## Blood Report Summary
 
     {summary}
-    """
+    """]
     
     # Add back expanded possible indications section with improved table layout
     if insights:
-        full_summary += "\n### Possible Health Implications\n"
+        parts.append("\n### Possible Health Implications\n")
         
         # Create simplified table headers - no custom styling for status
-        full_summary += """
+        parts.append("""
 | Test | Status | Possible Conditions | Clinical Significance |
 |------|--------|-------------------|----------------------|
-"""
+""")
         
         # Process insights and group by test name
         test_insights = {}
@@ -1124,38 +1359,44 @@ def summarize_report(text, extracted_values, abnormal_values, insights):
                 else:  # High
                     expanded_info = get_expanded_high_indication(test_name)
                 
-                full_summary += f"| **{test_name}** ({BLOOD_TEST_CORPUS.get(test_name, test_name)}) | {status} | {expanded_info['conditions']} | {expanded_info['details']} |\n"
+                parts.append(f"| **{test_name}** ({BLOOD_TEST_CORPUS.get(test_name, test_name)}) | {status} | {expanded_info['conditions']} | {expanded_info['details']} |\n")
     
-    return full_summary
+    return "".join(parts)
+
+# Panels used to group the results for display, in display order
+TEST_CATEGORIES = {
+    "Complete Blood Count (CBC)": ["RBC", "WBC", "Hb", "HCT", "MCV", "MCH", "MCHC", "RDW", "PLT", "MPV", "PDW", "PCT"],
+    "White Blood Cell Differential": ["Neutrophils", "Lymphocytes", "Monocytes", "Eosinophils", "Basophils", 
+                                      "NeutrophilsAbs", "LymphocytesAbs", "MonocytesAbs", "EosinophilsAbs", 
+                                      "BasophilsAbs", "Bands", "Segs"],
+    "Kidney Function": ["BUN", "Creatinine", "eGFR", "BUN/Creatinine Ratio", "Uric Acid", "Cystatin C"],
+    "Electrolytes": ["Sodium", "Potassium", "Chloride", "Bicarbonate", "Carbon Dioxide", "Calcium", 
+                     "Ionized Calcium", "Phosphorus", "Magnesium"],
+    "Liver Function": ["Total Protein", "Albumin", "Globulin", "A/G Ratio", "Total Bilirubin", 
+                       "Direct Bilirubin", "Indirect Bilirubin", "Alkaline Phosphatase", "ALT", "AST", 
+                       "GGT", "LDH"],
+    "Lipid Panel": ["Cholesterol", "Triglycerides", "HDL", "LDL", "VLDL", "Non-HDL", "TC/HDL Ratio", 
+                    "LDL/HDL Ratio", "ApoA", "ApoB", "Lp(a)"],
+    "Blood Glucose": ["Glucose", "FBS", "RBS", "HbA1c", "Insulin", "HOMA-IR", "C-Peptide"],
+    "Thyroid Function": ["TSH", "T3", "T4", "Free T3", "Free T4", "T3 Uptake", "Thyroglobulin", "TBG"],
+    "Iron Studies": ["Iron", "TIBC", "UIBC", "Transferrin", "Transferrin Saturation", "Ferritin"],
+    "Vitamins": ["Vitamin B12", "Folate", "Vitamin D", "25-OH Vitamin D", "1,25-OH Vitamin D", 
+                 "Vitamin A", "Vitamin E", "Vitamin K"],
+    "Inflammatory Markers": ["CRP", "hsCRP", "ESR", "Procalcitonin"],
+    "Coagulation Studies": ["PT", "INR", "aPTT", "Fibrinogen", "D-dimer"],
+    "Cardiac Markers": ["Troponin I", "Troponin T", "CK", "CK-MB", "BNP", "NT-proBNP", "Homocysteine"],
+    "Other": []  # Will hold tests that don't fit into above categories
+}
+
+# Every test that belongs to a named panel; anything else goes to "Other"
+ALL_CATEGORIZED_TESTS = frozenset(test for category, tests in TEST_CATEGORIES.items() if category != "Other"
+                                  for test in tests)
 
+@st.cache_data(show_spinner=False)
 def categorize_blood_tests(results):
     """Categorize blood test results into panels for better display"""
-    categories = {
-        "Complete Blood Count (CBC)": ["RBC", "WBC", "Hb", "HCT", "MCV", "MCH", "MCHC", "RDW", "PLT", "MPV", "PDW", "PCT"],
-        "White Blood Cell Differential": ["Neutrophils", "Lymphocytes", "Monocytes", "Eosinophils", "Basophils", 
-                                          "NeutrophilsAbs", "LymphocytesAbs", "MonocytesAbs", "EosinophilsAbs", 
-                                          "BasophilsAbs", "Bands", "Segs"],
-        "Kidney Function": ["BUN", "Creatinine", "eGFR", "BUN/Creatinine Ratio", "Uric Acid", "Cystatin C"],
-        "Electrolytes": ["Sodium", "Potassium", "Chloride", "Bicarbonate", "Carbon Dioxide", "Calcium", 
-                         "Ionized Calcium", "Phosphorus", "Magnesium"],
-        "Liver Function": ["Total Protein", "Albumin", "Globulin", "A/G Ratio", "Total Bilirubin", 
-                           "Direct Bilirubin", "Indirect Bilirubin", "Alkaline Phosphatase", "ALT", "AST", 
-                           "GGT", "LDH"],
-        "Lipid Panel": ["Cholesterol", "Triglycerides", "HDL", "LDL", "VLDL", "Non-HDL", "TC/HDL Ratio", 
-                        "LDL/HDL Ratio", "ApoA", "ApoB", "Lp(a)"],
-        "Blood Glucose": ["Glucose", "FBS", "RBS", "HbA1c", "Insulin", "HOMA-IR", "C-Peptide"],
-        "Thyroid Function": ["TSH", "T3", "T4", "Free T3", "Free T4", "T3 Uptake", "Thyroglobulin", "TBG"],
-        "Iron Studies": ["Iron", "TIBC", "UIBC", "Transferrin", "Transferrin Saturation", "Ferritin"],
-        "Vitamins": ["Vitamin B12", "Folate", "Vitamin D", "25-OH Vitamin D", "1,25-OH Vitamin D", 
-                     "Vitamin A", "Vitamin E", "Vitamin K"],
-        "Inflammatory Markers": ["CRP", "hsCRP", "ESR", "Procalcitonin"],
-        "Coagulation Studies": ["PT", "INR", "aPTT", "Fibrinogen", "D-dimer"],
-        "Cardiac Markers": ["Troponin I", "Troponin T", "CK", "CK-MB", "BNP", "NT-proBNP", "Homocysteine"],
-        "Other": []  # Will hold tests that don't fit into above categories
-    }
-    
     categorized_results = {}
-    for category, tests in categories.items():
+    for category, tests in TEST_CATEGORIES.items():
         category_results = {}
         for test in tests:
             # Only include tests that are actually in the extracted values
@@ -1167,16 +1408,144 @@ def categorize_blood_tests(results):
             categorized_results[category] = category_results
     
     # Add any remaining tests to "Other" category
-    other_results = {}
-    for test, value in results.items():
-        if not any(test in tests for _, tests in categories.items() if _ != "Other"):
-            other_results[test] = value
+    other_results = {test: value for test, value in results.items() if test not in ALL_CATEGORIZED_TESTS}
     
     if other_results:
         categorized_results["Other"] = other_results
     
     return categorized_results
 
+# NORMAL_RANGES as one table indexed by test code, holding the columns the result
+# tables show and the panel (and position within it) each test is listed under
+_TEST_PANELS = {test: (category, position)
+                for category, tests in TEST_CATEGORIES.items() for position, test in enumerate(tests)}
+NORMAL_RANGES_DF = pd.DataFrame.from_dict(NORMAL_RANGES, orient='index', columns=['low', 'high', 'Unit'])
+NORMAL_RANGES_DF['Test Name'] = [BLOOD_TEST_CORPUS.get(test, test) for test in NORMAL_RANGES_DF.index]
+NORMAL_RANGES_DF['Normal Range'] = _RANGE_LABELS
+NORMAL_RANGES_DF['Category'] = [_TEST_PANELS.get(test, ("Other", 0))[0] for test in NORMAL_RANGES_DF.index]
+NORMAL_RANGES_DF['Panel Position'] = [_TEST_PANELS.get(test, ("Other", 0))[1] for test in NORMAL_RANGES_DF.index]
+
+RESULT_TABLE_COLUMNS = ["Test", "Test Name", "Value", "Unit", "Normal Range", "Status"]
+ABNORMAL_TABLE_COLUMNS = ["Test Code", "Test Name", "Value", "Unit", "Normal Range", "Status", "low", "high", "Deviation"]
+
+def build_results_table(results):
+    """Join the extracted values with NORMAL_RANGES_DF and flag each one, or None if no test has a range"""
+    # Tests without normal ranges drop out of the join (they would have an N/A status)
+    values = pd.Series(results, dtype=np.float64, name='Value')
+    merged = values.to_frame().join(NORMAL_RANGES_DF, how='inner')
+    if merged.empty:
+        return None
+    
+    flags = _flag_ranges(merged['Value'].to_numpy(), merged['low'].to_numpy(np.float64),
+                         merged['high'].to_numpy(np.float64))
+    merged['Status'] = _STATUS_LABELS[flags + 1]
+    return merged.rename_axis('Test').reset_index()
+
+def split_results_by_category(results_table):
+    """Split the results table into one display table per category, rows in panel order"""
+    if results_table is None:
+        return {}
+    return {category: group.sort_values('Panel Position', kind='stable')[RESULT_TABLE_COLUMNS].reset_index(drop=True)
+            for category, group in results_table.groupby('Category', sort=False)}
+
+def find_abnormal_tests(results_table):
+    """Return the out-of-range rows of the results table with their percent deviation, most abnormal first"""
+    if results_table is None:
+        return pd.DataFrame(columns=ABNORMAL_TABLE_COLUMNS)
+    abnormal = results_table[results_table['Status'] != 'Normal'].rename(columns={'Test': 'Test Code'})
+    # Deviation is measured from whichever bound the value crossed
+    bound = np.where(abnormal['Status'] == 'Low', abnormal['low'], abnormal['high']).astype(np.float64)
+    abnormal = abnormal.assign(Deviation=(abnormal['Value'].to_numpy() - bound) / bound * 100)
+    abnormal = abnormal.sort_values('Deviation', key=np.abs, ascending=False, kind='stable')
+    return abnormal[ABNORMAL_TABLE_COLUMNS].reset_index(drop=True)
+
+# The chart is drawn with one artist collection per layer instead of an axvspan
+# and two axvline calls per test, and cached as PNG bytes so a rerun for the
+# same abnormal values does not redraw it
+@st.cache_data(show_spinner=False)
+def render_abnormal_values_chart(abnormal_tests):
+    """Draw the abnormal values against their normal ranges and return the chart as PNG bytes"""
+    tests = abnormal_tests['Test Code'].to_numpy()
+    values = abnormal_tests['Value'].to_numpy(np.float64)
+    lows = abnormal_tests['low'].to_numpy(np.float64)
+    highs = abnormal_tests['high'].to_numpy(np.float64)
+    is_low = (abnormal_tests['Status'] == 'Low').to_numpy()
+    
+    # Taller graph for more tests ensures adequate spacing, with extra room between bars
+    fig, ax = plt.subplots(figsize=(10, max(7, len(tests) * 0.9)))
+    y_pos = np.arange(len(tests)) * 1.5
+    bar_height = 0.6
+    
+    # Normal range background behind each bar, then the value bars (blue low, red high)
+    ax.barh(y_pos, highs - lows, left=lows, height=bar_height, color='green', alpha=0.2)
+    ax.barh(y_pos, values, align='center', color=np.where(is_low, '#0277bd', '#c62828'), alpha=0.8, height=bar_height)
+    
+    # Dashed lines at both normal range boundaries of every test
+    ax.vlines(np.concatenate([lows, highs]), np.tile(y_pos - bar_height / 2, 2), np.tile(y_pos + bar_height / 2, 2),
+              colors='green', linestyles='--', alpha=0.7, linewidth=1)
+    
+    # Test codes on the y-axis with direction indicators: ▼ for low values, ▲ for high values
+    ax.set_yticks(y_pos)
+    ax.set_yticklabels([f"{indicator} {test}" for indicator, test in zip(np.where(is_low, "▼", "▲"), tests)], fontsize=10)
+    
+    ax.set_xlabel('Value', fontsize=11)
+    ax.set_title('Abnormal Blood Test Values', fontsize=14)
+    legend_elements = [
+        Patch(facecolor='#c62828', alpha=0.8, label='High Value'),
+        Patch(facecolor='#0277bd', alpha=0.8, label='Low Value'),
+        Patch(facecolor='green', alpha=0.2, label='Normal Range')
+    ]
+    ax.legend(handles=legend_elements, loc='upper right', fontsize=10)
+    
+    # Extra space at top and bottom, largest deviations at the top
+    ax.set_ylim(y_pos.min() - 1.5, y_pos.max() + 1.5)
+    ax.invert_yaxis()
+    ax.grid(False)
+    plt.tight_layout(pad=2.0)
+    
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png')
+    plt.close(fig)
+    return buffer.getvalue()
+
+# Inline styles for the Value and Status cells of each result row
+_STATUS_STYLES = {
+    "High": "color: #c62828; font-weight: bold",
+    "Low": "color: #0277bd; font-weight: bold",
+    "Normal": "color: green",
+}
+_STYLED_COLUMNS = frozenset(["Value", "Status"])
+
+def _format_value(value):
+    """Format a test value for display exactly as it was extracted"""
+    return str(float(value))
+
+# The HTML is rendered once per table and cached, rather than building a Styler
+# that runs a Python callback per cell and is re-serialized on every rerun
+@st.cache_data(show_spinner=False)
+def render_results_table_html(df, caption=""):
+    """Render a category table as an HTML table with the Value and Status cells coloured by status"""
+    cells = df.assign(Value=df['Value'].map(_format_value)).astype(str)
+    styled = [column in _STYLED_COLUMNS for column in df.columns]
+    header = ''.join(f'<th>{html.escape(column)}</th>' for column in df.columns)
+    rows = []
+    for row, status in zip(cells.itertuples(index=False, name=None), df['Status']):
+        style = _STATUS_STYLES.get(status, "")
+        rows.append('<tr>' + ''.join(f'<td style="{style}">{html.escape(cell)}</td>' if is_styled else f'<td>{html.escape(cell)}</td>'
+                                     for cell, is_styled in zip(row, styled)) + '</tr>')
+    if caption:
+        caption = f'<caption style="text-align: left">{html.escape(caption)}</caption>'
+    return f'<table style="width: 100%">{caption}<thead><tr>{header}</tr></thead><tbody>{"".join(rows)}</tbody></table>'
+
+# Tables longer than this are shown as an interactive st.dataframe instead of
+# static HTML, where scrolling and sorting are worth the Arrow serialization
+HTML_TABLE_MAX_ROWS = 50
+
+def style_results_table(df):
+    """Return a Styler colouring the Value and Status cells of a results table by status"""
+    styles = df['Status'].map(_STATUS_STYLES).fillna("").to_numpy()
+    return df.style.apply(lambda column: styles, subset=["Value", "Status"]).format(_format_value, subset=["Value"])
+
 def process_file(file_path):
     """Process a file (PDF or image) and return the analysis results"""
     # Extract text from the uploaded file
@@ -1188,8 +1557,7 @@ def process_file(file_path):
             return {"error": "PDF processing requires pdf2image and pytesseract libraries."}
     else:
         if TESSERACT_AVAILABLE:
-            image = Image.open(file_path)
-            text = extract_text_from_image(image)
+            text = extract_text_from_image(file_path)
         else:
             return {"error": "Image processing requires pytesseract library."}
     
@@ -1319,8 +1687,7 @@ def main():
         else:
             if TESSERACT_AVAILABLE:
                 with st.spinner("Extracting text from image..."):
-                    image = Image.open(uploaded_file)
-                    text = extract_text_from_image(image)
+                    text = extract_text_from_image(uploaded_file)
             else:
                 st.error("Image processing requires pytesseract.")
     
@@ -1343,187 +1710,41 @@ def main():
                 # Display summary
                 st.markdown(summary)
                 
-                # Categorize blood tests by panel
+                # Categorize blood tests by panel, and flag every value with a range in one pass
                 categorized_results = categorize_blood_tests(extracted_values)
+                results_table = build_results_table(extracted_values)
+                category_tables = split_results_by_category(results_table)
                 
                 # Display values as tables by category
                 st.subheader("Blood Test Values by Category")
                 
-                for category, category_results in categorized_results.items():
-                    if category_results:
-                        with st.expander(f"{category} ({len(category_results)} tests)"):
-                            # Add category description
-                            if category in CATEGORY_DESCRIPTIONS:
-                                st.info(CATEGORY_DESCRIPTIONS[category])
-                            
-                            table_data = []
-                            for test, value in category_results.items():
-                                test_name = BLOOD_TEST_CORPUS.get(test, test)
-                                if test in NORMAL_RANGES:
-                                    low, high, unit = NORMAL_RANGES[test]
-                                    status = "Normal"
-                                    if value < low:
-                                        status = "Low"
-                                    elif value > high:
-                                        status = "High"
-                                    table_data.append({
-                                        "Test": test,
-                                        "Test Name": test_name,
-                                        "Value": value,
-                                        "Unit": unit,
-                                        "Normal Range": f"{low} - {high}",
-                                        "Status": status
-                                    })
-                                # Skip tests without normal ranges (which would result in N/A status)
-                        
-                            if table_data:
-                                df = pd.DataFrame(table_data)
-                                
-                                # Create a styler object
-                                styler = df.style
-                                
-                                # Define style functions for different statuses
-                                def style_high(v):
-                                    return 'color: #c62828; font-weight: bold'
-                                
-                                def style_low(v):
-                                    return 'color: #0277bd; font-weight: bold'
-                                
-                                def style_normal(v):
-                                    return 'color: green'
-                                
-                                # Apply styles based on conditions
-                                styler = styler.applymap(
-                                    style_high, 
-                                    subset=pd.IndexSlice[df['Status'] == 'High', ['Value', 'Status']]
-                                )
-                                styler = styler.applymap(
-                                    style_low, 
-                                    subset=pd.IndexSlice[df['Status'] == 'Low', ['Value', 'Status']]
-                                )
-                                styler = styler.applymap(
-                                    style_normal, 
-                                    subset=pd.IndexSlice[df['Status'] == 'Normal', ['Value', 'Status']]
-                                )
-                                
-                                st.dataframe(styler, use_container_width=True)
+                # One tab per category, skipping categories where no detected test has a
+                # normal range to show
+                shown_categories = [(category, category_results) for category, category_results in categorized_results.items()
+                                    if category in category_tables]
+                if shown_categories:
+                    tabs = st.tabs([f"{category} ({len(category_results)} tests)" for category, category_results in shown_categories])
+                    for tab, (category, _) in zip(tabs, shown_categories):
+                        df = category_tables[category]
+                        # The category description is the table's caption rather than a separate widget
+                        description = CATEGORY_DESCRIPTIONS.get(category, "")
+                        with tab:
+                            if len(df) <= HTML_TABLE_MAX_ROWS:
+                                st.markdown(render_results_table_html(df, description), unsafe_allow_html=True)
+                            else:
+                                st.dataframe(style_results_table(df), use_container_width=True)
+                                if description:
+                                    st.caption(description)
                 
-                # Enhance the abnormal values visualization
-                abnormal_tests_data = []
-                for test, value in extracted_values.items():
-                    if test in NORMAL_RANGES:
-                        low, high, unit = NORMAL_RANGES[test]
-                        if value < low or value > high:
-                            status = "Low" if value < low else "High"
-                            abnormal_tests_data.append({
-                                "Test Code": test,
-                                "Test Name": BLOOD_TEST_CORPUS.get(test, test),
-                                "Value": value,
-                                "Unit": unit,
-                                "Normal Range": f"{low} - {high}",
-                                "Status": status,
-                                "Deviation": ((value - low) / low * 100 if value < low else (value - high) / high * 100)
-                            })
+                # Enhance the abnormal values visualization, sorted by deviation severity
+                abnormal_tests = find_abnormal_tests(results_table)
+                abnormal_tests_data = abnormal_tests.to_dict('records')
                 
                 # if abnormal_tests_data:
                 #     st.subheader("Abnormal Values Visualization")
                     
                 #     # ===== GRAPH CODE START =====
-                #     # Sort abnormal values by deviation severity (most abnormal first)
-                #     abnormal_tests_data = sorted(abnormal_tests_data, key=lambda x: abs(x['Deviation']), reverse=True)
-                    
-                #     # Create a figure with dynamic height based on the number of tests
-                #     # Taller graph for more tests ensures adequate spacing
-                #     fig_height = max(7, len(abnormal_tests_data) * 0.9)  # Minimum height of 7 inches
-                #     fig, ax = plt.subplots(figsize=(10, fig_height))
-                    
-                #     # Extract the necessary data from the abnormal values
-                #     tests = [f"{item['Test Code']}" for item in abnormal_tests_data]  # Test codes for y-axis
-                #     values = [item['Value'] for item in abnormal_tests_data]  # Actual test values
-                #     normal_low = [float(item['Normal Range'].split(' - ')[0]) for item in abnormal_tests_data]  # Lower bounds
-                #     normal_high = [float(item['Normal Range'].split(' - ')[1]) for item in abnormal_tests_data]  # Upper bounds
-                #     statuses = [item['Status'] for item in abnormal_tests_data]  # Whether values are high or low
-                    
-                #     # Create spaced y-positions for the bars (factor of 1.5 increases spacing between bars)
-                #     y_pos = np.arange(0, len(tests) * 1.5, 1.5)  # Creates evenly spaced positions with extra room
-                    
-                #     # Plot the normal range background for each test
-                #     # These are shown as green spans behind each bar
-                #     for i, (low, high) in enumerate(zip(normal_low, normal_high)):
-                #         # Calculate the vertical position and height for each normal range rectangle
-                #         bar_height = 0.6  # Height of each bar
-                #         y_center = y_pos[i]  # Center position of the current bar
-                        
-                #         # Convert the absolute y-position to a relative position (0-1 range)
-                #         # This is required by matplotlib's axvspan function
-                #         y_min = (y_center - bar_height/2) / (len(tests) * 1.5)
-                #         y_max = (y_center + bar_height/2) / (len(tests) * 1.5)
-                        
-                #         # Draw a green rectangle from lower to upper bound of normal range
-                #         ax.axvspan(low, high, alpha=0.2, color='green', ymin=y_min, ymax=y_max)
-                    
-                #     # Plot the actual test value bars
-                #     # Color-coded: blue for low values, red for high values
-                #     colors = ['#0277bd' if status == 'Low' else '#c62828' for status in statuses]
-                #     bars = ax.barh(y_pos, values, align='center', color=colors, alpha=0.8, height=0.6)
-                    
-                #     # Set up the test names on the y-axis with appropriate indicators
-                #     ax.set_yticks(y_pos)  # Position the labels at the bar centers
-                #     y_labels = []
-                #     for i, test in enumerate(tests):
-                #         # Add direction indicators: ▼ for low values, ▲ for high values
-                #         status_indicator = "▼" if statuses[i] == "Low" else "▲"
-                #         y_labels.append(f"{status_indicator} {test}")
-                #     ax.set_yticklabels(y_labels, fontsize=10)
-                    
-                #     # Add reference lines showing the normal range boundaries for each test
-                #     for i, (low, high) in enumerate(zip(normal_low, normal_high)):
-                #         # Calculate the vertical position for each line
-                #         bar_height = 0.6
-                #         y_center = y_pos[i]
-                #         y_min = (y_center - bar_height/2) / (len(tests) * 1.5)
-                #         y_max = (y_center + bar_height/2) / (len(tests) * 1.5)
-                        
-                #         # Draw the lower normal range boundary line
-                #         ax.axvline(x=low, ymin=y_min, ymax=y_max, 
-                #                   color='green', linestyle='--', alpha=0.7, linewidth=1)
-                        
-                #         # Draw the upper normal range boundary line
-                #         ax.axvline(x=high, ymin=y_min, ymax=y_max, 
-                #                   color='green', linestyle='--', alpha=0.7, linewidth=1)
-                    
-                #     # Add labels and title to the graph
-                #     ax.set_xlabel('Value', fontsize=11)  # X-axis label
-                #     ax.set_title('Abnormal Blood Test Values', fontsize=14)  # Graph title
-                    
-                #     # Add a legend to explain the color coding
-                #     from matplotlib.patches import Patch
-                #     legend_elements = [
-                #         Patch(facecolor='#c62828', alpha=0.8, label='High Value'),  # Red for high
-                #         Patch(facecolor='#0277bd', alpha=0.8, label='Low Value'),   # Blue for low
-                #         Patch(facecolor='green', alpha=0.2, label='Normal Range')   # Green for normal range
-                #     ]
-                #     ax.legend(handles=legend_elements, loc='upper right', fontsize=10)
-                    
-                #     # Set the y-axis limits to add extra space at top and bottom
-                #     y_min = min(y_pos) - 1.5  # Add space at the bottom
-                #     y_max = max(y_pos) + 1.5  # Add space at the top
-                #     ax.set_ylim(y_min, y_max)
-                    
-                #     # Invert the y-axis so tests with largest deviations appear at the top
-                #     ax.invert_yaxis()
-                    
-                #     # Turn off the grid for a cleaner look
-                #     ax.grid(False)
-                    
-                #     # Adjust the subplot margins for better spacing
-                #     plt.subplots_adjust(left=0.2, right=0.9, top=0.9, bottom=0.1)
-                    
-                #     # Ensure the layout is tight and add padding around the edges
-                #     plt.tight_layout(pad=2.0)
-                    
-                #     # Display the graph in Streamlit
-                #     st.pyplot(fig)
+                #     st.image(render_abnormal_values_chart(abnormal_tests), use_column_width=True)
                 #     # ===== GRAPH CODE END =====
                     
                 #     # Add textual explanation of the most concerning values